@@ -38,6 +38,13 @@ SEP = os.path.sep
 INV_SEP = {"\\": '/', '/':'\\'}[os.path.sep]
 NO_CONV = {"prompt", "negative_prompt", "url", "trace", "message", "endpoint", "password"}
 
+def split_endpoints(endpoint, password):
+    endpoints = [e for e in endpoint.replace(";", " ").split() if e]
+    passwords = (password or "").split(";")
+    if len(passwords) != len(endpoints):
+        passwords = [password] * len(endpoints)
+    return list(zip(endpoints, passwords))
+
 def convert_path(p):
     return p.replace(INV_SEP, SEP)
 
@@ -87,6 +94,11 @@ class Backend(QObject):
                     self.inference = local.LocalInference(self.gui)
             else:
                 self.onResponse({"type": "remote_only"})
+        elif len(split_endpoints(endpoint, password)) > 1:
+            endpoints = split_endpoints(endpoint, password)
+            self.inference = remote.PooledRemoteInference(self.gui, endpoints, self.gui.config.get("remote_async"))
+        elif self.gui.config.get("remote_async"):
+            self.inference = remote.AsyncRemoteInference(self.gui, endpoint, password)
         else:
             self.inference = remote.RemoteInference(self.gui, endpoint, password)
         self.updated.emit()
@@ -110,7 +122,7 @@ class Backend(QObject):
     
     def debugLogging(self, type, data):
         if self.gui._debugJSONLogging:
-            if "type" in data and data["type"] == "remote_latency":
+            if "type" in data and data["type"] in {"remote_latency", "remote_pool"}:
                 return
 
             try:
@@ -137,9 +149,14 @@ class Backend(QObject):
         self.debugLogging("RESPONSE", response)
         self.response.emit(response)
 
+    def stats(self):
+        if self.inference and hasattr(self.inference, "getStats"):
+            return self.inference.getStats()
+        return {}
+
     @pyqtProperty(str, notify=updated)
     def mode(self):
-        if self.inference and type(self.inference) == remote.RemoteInference:
+        if self.inference and type(self.inference) in {remote.RemoteInference, remote.AsyncRemoteInference, remote.PooledRemoteInference}:
             return "Remote"
         elif self.inference and type(self.inference) == host.HostInference:
             return "Host"
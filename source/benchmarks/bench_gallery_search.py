@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import types
+import random
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+source = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(source, "tabs", "gallery"))
+sys.path.insert(0, source)
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer
+
+import sql
+import gallery
+
+FOLDER = "/outputs/txt2img"
+WORDS = [f"word{i}" for i in range(400)] + ["castle", "dragon", "dragonfly", "night", "forest", "portrait", "city", "ocean"]
+MODELS = ["anything-v3", "realistic-vision", "dreamshaper", "sd-v1-5"]
+SAMPLERS = ["Euler a", "DPM++ 2M Karras", "DDIM", "UniPC"]
+SEARCHES = ["", "castle", "castle; -night", "dragon*", "portrait; forest; city", "sampler: DDIM", "castle; steps: 30"]
+
+def populate(conn, rows, rng):
+    # mirrors the images table and FTS index the Populater creates
+    conn.write("CREATE TABLE images(file TEXT UNIQUE, folder TEXT, parameters TEXT, idx INTEGER, width INTEGER, height INTEGER, model TEXT COLLATE NOCASE, sampler TEXT COLLATE NOCASE, seed INTEGER, steps INTEGER, scale REAL, CONSTRAINT unq UNIQUE (folder, idx));")
+    for column in ["model", "sampler", "seed", "steps", "scale", "width, height"]:
+        name = column.split(",")[0]
+        conn.write(f"CREATE INDEX images_{name} ON images(folder, {column}, idx);")
+    conn.write("CREATE TABLE image_networks(file TEXT, type TEXT, name TEXT COLLATE NOCASE, strength REAL);")
+    populater = types.SimpleNamespace(conn=conn, fts=False)
+    gallery.Populater.prepareSearch(populater)
+
+    batch = 50000
+    for offset in range(0, rows, batch):
+        columns = {k: [] for k in [":file", ":folder", ":param", ":idx", ":width", ":height", ":model", ":sampler", ":seed", ":steps", ":scale"]}
+        for i in range(offset, min(rows, offset + batch)):
+            model, sampler = rng.choice(MODELS), rng.choice(SAMPLERS)
+            seed, steps, scale = rng.randrange(2**32), rng.choice([20, 25, 30, 40]), rng.choice([5.0, 7.0, 7.5, 9.0])
+            prompt = ", ".join(rng.choices(WORDS, k=16))
+            negative = ", ".join(rng.choices(WORDS, k=6))
+            parameters = f"{prompt}\nNegative prompt: {negative}\nSteps: {steps}, Sampler: {sampler}, CFG scale: {scale}, Seed: {seed}, Size: 512x512, Model: {model}"
+            for key, value in zip(columns, [f"{FOLDER}/{i:08d}.png", FOLDER, parameters, i, 512, 512, model, sampler, seed, steps, scale]):
+                columns[key] += [value]
+        conn.writeBatch("INSERT INTO images(file, folder, parameters, idx, width, height, model, sampler, seed, steps, scale) VALUES (:file, :folder, :param, :idx, :width, :height, :model, :sampler, :seed, :steps, :scale);", columns, wait=True)
+    return populater.fts
+
+def wait(signal, timeout=600):
+    loop = QEventLoop()
+    signal.connect(loop.quit)
+    QTimer.singleShot(timeout*1000, loop.quit)
+    loop.exec()
+    signal.disconnect(loop.quit)
+
+def statement(text, fts):
+    owner = types.SimpleNamespace(populater=types.SimpleNamespace(fts=fts))
+    return gallery.Gallery.searchQuery(owner, FOLDER, text, "")
+
+def first_page(text, fts):
+    search = statement(text, fts)
+    model = sql.Sql(None)
+    model.pageSize = 256
+    model.key = "file"
+    start = time.perf_counter()
+    model.bindings = search["bindings"]
+    model.countQuery = search["count"]
+    model.query = search["query"]
+    wait(model.resultsChanged)
+    elapsed = time.perf_counter() - start
+    # the count follows the first page on its own query
+    while model.countRunnable:
+        wait(model.resultsChanged)
+    counted = time.perf_counter() - start
+    total = model.total
+    model.deleteLater()
+    return elapsed, counted, total
+
+def last_page(conn, text, fts, total):
+    search = statement(text, fts)
+    runnable = sql.QueryRunnable(search["query"], False, search["bindings"], max(0, (total-1) // 256), 256)
+    start = time.perf_counter()
+    runnable.run(conn)
+    return time.perf_counter() - start
+
+def full_fetch(text, fts):
+    search = statement(text, fts)
+    model = sql.Sql(None)
+    start = time.perf_counter()
+    model.bindings = search["bindings"]
+    model.query = search["query"]
+    while True:
+        wait(model.resultsChanged)
+        if not model.partial:
+            break
+    elapsed = time.perf_counter() - start
+    total = len(model.results)
+    model.deleteLater()
+    return elapsed, total
+
+def legacy_delta(conn, search, key):
+    # deltaQuery before counting positions: ROW_NUMBER over the whole result to find one row
+    head, order = search["query"][:-1].rsplit(" ORDER BY ", 1)
+    runnable = sql.QueryRunnable(f"SELECT * FROM (SELECT ROW_NUMBER() OVER (ORDER BY {order}) - 1 AS sql_position, {head[7:]}) WHERE file IN (?);", False, search["bindings"] + [key])
+    start = time.perf_counter()
+    runnable.run(conn)
+    return time.perf_counter() - start
+
+def delta(conn, text, fts, index):
+    search = statement(text, fts)
+    model = sql.Sql(None)
+    model.pageSize = 256
+    model.key = "file"
+    model.bindings = search["bindings"]
+    model.countQuery = search["count"]
+    model.query = search["query"]
+    wait(model.resultsChanged)
+    while model.countRunnable:
+        wait(model.resultsChanged)
+
+    key = f"{FOLDER}/new-{index}.png"
+    parameters = "castle dragon portrait forest city night\nSteps: 20, Sampler: DDIM, CFG scale: 7, Seed: 1, Size: 512x512, Model: sd-v1-5"
+    start = time.perf_counter()
+    conn.write("INSERT INTO images(file, folder, parameters, idx, width, height, model, sampler, seed, steps, scale) VALUES (?, ?, ?, (SELECT MAX(idx) + 1 FROM images), 512, 512, 'sd-v1-5', 'DDIM', 1, 20, 7.0);", [key, FOLDER, parameters])
+    while not model.deltas and not model.reloads:
+        wait(model.resultsChanged)
+    elapsed = time.perf_counter() - start
+    placed = model.record(0).value(0) == key and model.reloads == 0
+    model.deleteLater()
+    return elapsed, placed, legacy_delta(conn, search, key)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gallery search and paged fetch on a synthetic images table")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--search", action="append", help="run only these searches")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    database = sql.Database(None)
+    conn = sql.Connection()
+    conn.connect()
+
+    start = time.perf_counter()
+    fts = populate(conn, args.rows, random.Random(0))
+    print(f"populated {args.rows} rows in {time.perf_counter()-start:.1f}s (fts5 {'available' if fts else 'missing'})")
+
+    for text in args.search or SEARCHES:
+        line = f"{text or '(all)':<24}"
+        for label, enabled in [("fts", fts), ("like", False)]:
+            if label == "fts" and not fts:
+                continue
+            elapsed, counted, total = first_page(text, enabled)
+            deep = last_page(conn, text, enabled, total)
+            line += f" | {label} first page {1000*elapsed:7.1f}ms counted {1000*counted:7.1f}ms last page {1000*deep:7.1f}ms"
+        print(f"{line} | {total} rows")
+
+    conn.enableNotifications("images", "file")
+    for index, text in enumerate(["", "castle", "portrait; forest; city"]):
+        elapsed, placed, legacy = delta(conn, text, fts, index)
+        print(f"{text or '(all)':<24} | insert at top applied in {1000*elapsed:7.1f}ms ({'in place' if placed else 'reloaded'}) | ROW_NUMBER lookup {1000*legacy:7.1f}ms")
+    conn.disableNotifications("images")
+
+    elapsed, total = full_fetch("", fts)
+    print(f"{'(all) unpaged':<24} | full fetch {1000*elapsed:8.1f}ms | {total} rows")
+
+    conn.close()
+    database.stop()
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import queue
+import argparse
+import tempfile
+import threading
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication
+
+import local
+from standin_server import Session
+
+class FakeInferenceThread(threading.Thread):
+    # stands in for the wrapper: echoes the input image back as a result
+    def __init__(self, requests, responses, model_directory):
+        super().__init__(daemon=True)
+        self.stopping = False
+        self.requests = requests
+        self.responses = responses
+        self.current = None
+
+    def run(self):
+        self.requests.put({"type":"options"})
+        while not self.stopping:
+            try:
+                request = self.requests.get(True, 0.01)
+            except queue.Empty:
+                continue
+            if request["type"] == "options":
+                self.responses.put({"type": "options", "data": {}})
+            elif request["type"] == "img2img":
+                image = request["data"]["image"]
+                self.responses.put({"type": "result", "id": request["id"], "data": {"type": "PNG", "images": [image]}})
+
+    def cancel(self, id):
+        pass
+
+class FakeInferenceProcess(local.InferenceProcess):
+    def run(self):
+        local.InferenceProcessThread = FakeInferenceThread
+        super().run()
+
+class FakeGUI():
+    def __init__(self, directory):
+        self.directory = directory
+
+    def modelDirectory(self):
+        return self.directory
+
+def bench(label, gui, size, count):
+    local.InferenceProcess = FakeInferenceProcess
+    inference = local.LocalInference(gui)
+    session = Session(inference)
+    session.start()
+
+    image = os.urandom(size)
+    latencies = []
+    try:
+        start = time.perf_counter()
+        for i in range(count):
+            sent = time.perf_counter()
+            inference.onRequest({"type": "img2img", "id": i, "data": {"image": image}})
+            t, response = session.waitForType("result", i, 60)
+            assert len(response["data"]["images"][0]) == size
+            latencies += [t - sent]
+        total = time.perf_counter() - start
+        stats = inference.getStats()
+    finally:
+        session.stop()
+
+    rings = [stats[k] for k in ["request_ring", "response_ring"] if k in stats]
+    fallbacks = sum(ring["fallbacks"] for ring in rings)
+    transferred = sum(ring["transferred"] for ring in rings) // (1024*1024)
+    mb = 2 * size * count / (1024*1024)
+    print(f"{label:>5} {size//(1024*1024):3d}MB: {mb/total:8.1f} MB/s | "
+          f"round trip p50 {1000*statistics.median(latencies):7.2f}ms "
+          f"max {1000*max(latencies):7.2f}ms | ring {transferred}MB fallbacks {fallbacks}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared memory ring vs plain multiprocessing queue for large local payloads")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 8, 32])
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    gui = FakeGUI(tempfile.mkdtemp())
+    create_ring = local.create_ring
+    for size in args.sizes:
+        local.create_ring = lambda: None
+        bench("queue", gui, size*1024*1024, args.count)
+        local.create_ring = create_ring
+        bench("ring", gui, size*1024*1024, args.count)
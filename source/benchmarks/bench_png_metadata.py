@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import zlib
+import struct
+import random
+import argparse
+import tempfile
+
+source = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(source, "tabs", "gallery"))
+sys.path.insert(0, source)
+
+import PIL.Image
+import PIL.PngImagePlugin
+
+import gallery
+
+def legacy(file):
+    # readImage before the chunk reader: every file opened through PIL
+    w, h, p = 0, 0, ""
+    with PIL.Image.open(file) as img:
+        if "parameters" in img.info:
+            p = img.info["parameters"]
+        w, h = img.size
+    return w, h, p
+
+def chunk(kind, data, *_):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def make_folder(folder, count, rng):
+    base = PIL.Image.new("RGB", (512, 512))
+    base.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(512*512)])
+    template = os.path.join(folder, "template.png")
+    base.save(template)
+    with open(template, "rb") as f:
+        data = f.read()
+    os.remove(template)
+
+    # reuse the encoded pixels and only vary the text chunk so 10k files stay quick to write
+    end = data.index(b"IDAT") - 4
+    for i in range(count):
+        info = PIL.PngImagePlugin.PngInfo()
+        words = " ".join(rng.choices(["castle", "dragon", "night", "forest", "portrait", "city", "ocean"], k=24))
+        info.add_text("parameters", f"{words}\nNegative prompt: blurry\nSteps: 20, Sampler: Euler a, CFG scale: 7, Seed: {i}, Size: 512x512, Model: sd-v1-5", zip=i % 4 == 0)
+        chunks = b"".join(chunk(*c) for c in info.chunks)
+        with open(os.path.join(folder, f"{i:05d}.png"), "wb") as f:
+            f.write(data[:end] + chunks + data[end:])
+
+def bench(files, function):
+    start = time.perf_counter()
+    results = [function(f) for f in files]
+    return len(files) / (time.perf_counter() - start), results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PNG metadata read rate, PIL vs the chunk header reader")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        make_folder(folder, args.count, random.Random(0))
+        files = sorted(os.path.join(folder, f) for f in os.listdir(folder))
+
+        for round in range(args.rounds):
+            before, expected = bench(files, legacy)
+            after, results = bench(files, gallery.readPNG)
+            assert results == expected
+            print(f"round {round}: {len(files)} files | PIL {before:8.0f} files/s | readPNG {after:8.0f} files/s ({after/before:4.1f}x)")
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication
+
+import remote
+from standin_server import StandinServer, Session
+
+def sequential(session, count):
+    latencies = []
+    for i in range(count):
+        id = f"seq-{i}"
+        start = time.perf_counter()
+        session.inference.onRequest({"type": "txt2img", "id": id, "data": {}})
+        t, _ = session.waitForType("ack", id)
+        latencies += [t - start]
+    return latencies
+
+def burst(session, count):
+    ids = [f"burst-{i}" for i in range(count)]
+    start = time.perf_counter()
+    for id in ids:
+        session.inference.onRequest({"type": "txt2img", "id": id, "data": {}})
+    session.waitForType("ack", ids[-1], 30)
+    return time.perf_counter() - start
+
+def idle_cpu(session, seconds):
+    start = time.process_time()
+    session.idle(seconds)
+    return (time.process_time() - start) / seconds
+
+def bench(transport, url, count, idle):
+    session = Session(transport(None, url))
+    session.start()
+    try:
+        latencies = sequential(session, count)
+        stats = session.inference.getStats()
+        total = burst(session, count)
+        cpu = idle_cpu(session, idle)
+        leaked = len(session.inference.queued)
+    finally:
+        session.stop()
+
+    latencies = sorted(latencies)
+    print(f"{stats['transport']:>8}: "
+          f"ack p50 {1000*statistics.median(latencies):6.2f}ms "
+          f"p95 {1000*latencies[int(len(latencies)*0.95)]:6.2f}ms | "
+          f"dispatch {stats['dispatch_ms']:5.2f}ms max {stats['dispatch_max_ms']:5.2f}ms | "
+          f"burst {count/total:7.0f} req/s | "
+          f"idle cpu {100*cpu:4.1f}% | "
+          f"queued left {leaked}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Request dispatch latency of the remote transports against the stand-in server")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--idle", type=float, default=5.0)
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    server = StandinServer()
+    url = server.start()
+    for transport in [remote.RemoteInference, remote.AsyncRemoteInference]:
+        bench(transport, url, args.count, args.idle)
+    server.stop()
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication, QVariant
+from PyQt5.QtSql import QSqlRecord, QSqlField
+
+import sql
+
+def make_records(keys, template):
+    records = []
+    for key, value in keys:
+        record = QSqlRecord(template)
+        record.setValue(0, key)
+        record.setValue(1, value)
+        # QueryRunnable attaches the key on the worker thread
+        record.rowKey = key
+        records += [record]
+    return records
+
+def scenarios(rows, rng):
+    keys = [(f"/images/{i:08d}.png", i) for i in range(rows)]
+    changes = max(1, rows // 100)
+
+    for label, count in [("10", 10), ("1%", changes)]:
+        deleted = set(rng.sample(range(rows), count))
+        yield f"delete {label}", keys, [k for i, k in enumerate(keys) if not i in deleted]
+
+        inserted = list(keys)
+        for i in sorted(rng.sample(range(rows), count), reverse=True):
+            inserted.insert(i, (f"/images/new-{i:08d}.png", -i))
+        yield f"insert {label}", keys, inserted
+
+        updated = list(keys)
+        for i in rng.sample(range(rows), count):
+            updated[i] = (updated[i][0], -updated[i][1])
+        yield f"update {label}", keys, updated
+
+    moved = list(keys)
+    for _ in range(10):
+        moved.insert(rng.randrange(rows), moved.pop(rng.randrange(rows)))
+    yield "move 10", keys, moved
+
+    yield "prepend 1", keys, [("/images/first.png", -1)] + keys
+
+    yield "append 1", keys, keys + [("/images/last.png", -1)]
+
+    yield "unchanged", keys, keys
+
+def run(model, key, old, new):
+    model._key = key
+    model.results = list(old)
+    start = time.perf_counter()
+    model.updateResults(list(new))
+    return time.perf_counter() - start
+
+def bench(model, rows, legacy, rng, template):
+    for name, old, new in scenarios(rows, rng):
+        oldRecords = make_records(old, template)
+        newRecords = make_records(new, template)
+        expected = [(k, v) for k, v in new]
+
+        keyed = run(model, "file", oldRecords, newRecords)
+        assert [(r.value(0), r.value(1)) for r in model.results] == expected
+        line = f"{rows:>7} rows {name:<10}: keyed {1000*keyed:9.2f}ms"
+
+        if legacy:
+            unkeyed = run(model, "", oldRecords, newRecords)
+            assert [(r.value(0), r.value(1)) for r in model.results] == expected
+            line += f" | legacy {1000*unkeyed:10.2f}ms ({unkeyed/keyed:6.1f}x)"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keyed vs legacy result diffing in the Sql model")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--legacy-rows", type=int, default=10000, help="the legacy diff is quadratic, compare it on a smaller set")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    database = sql.Database(None)
+    model = sql.Sql(None)
+
+    template = QSqlRecord()
+    template.append(QSqlField("file", QVariant.String))
+    template.append(QSqlField("value", QVariant.Int))
+
+    bench(model, args.legacy_rows, True, random.Random(0), template)
+    bench(model, args.rows, False, random.Random(0), template)
+    database.stop()
@@ -0,0 +1,74 @@
+import os
+import io
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import PIL.Image
+from PyQt5.QtCore import QCoreApplication, QByteArray
+from PyQt5.QtGui import QImage
+
+import thumbnails
+
+SIZES = [(256, 256), (640, 640)]
+QUALITY = 75
+
+def legacy_thumbnail(file, size, quality):
+    # get_thumbnail before reduced decoding: full decode, full size convert, one size per decode
+    blob = io.BytesIO()
+    image = PIL.Image.open(file).convert('RGB')
+    image.thumbnail(size, PIL.Image.Resampling.LANCZOS)
+    image.save(blob, "JPEG", quality=quality)
+    return blob.getvalue()
+
+def legacy(file):
+    for size in SIZES:
+        blob = legacy_thumbnail(file, size, QUALITY)
+        QImage.fromData(QByteArray(blob), "JPG")
+
+def current(file):
+    images = thumbnails.get_thumbnails(file, SIZES)
+    for size in SIZES:
+        thumbnails.encode_thumbnail(images[size], QUALITY)
+    thumbnails.to_qimage(images[SIZES[0]])
+
+def make_image(path, width, height, seed):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    r = 127 + 127 * np.sin(x / (37 + seed % 11))
+    g = 127 + 127 * np.cos(y / (53 + seed % 7))
+    b = 127 + 127 * np.sin((x + y) / 91)
+    image = np.stack([r, g, b], axis=-1) + rng.normal(0, 12, (height, width, 3))
+    PIL.Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).save(path)
+
+def bench(files, function):
+    times = []
+    for file in files:
+        start = time.perf_counter()
+        function(file)
+        times += [time.perf_counter() - start]
+    return statistics.median(times)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per image thumbnail cost before and after reduced decoding, both sizes from one decode")
+    parser.add_argument("--count", type=int, default=10)
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    cases = [("png", 1024, 1024), ("png", 2048, 2048), ("jpg", 2048, 2048), ("jpg", 4096, 4096)]
+    with tempfile.TemporaryDirectory() as folder:
+        for ext, width, height in cases:
+            files = []
+            for i in range(args.count):
+                path = os.path.join(folder, f"{width}x{height}-{i}.{ext}")
+                make_image(path, width, height, i)
+                files += [path]
+            before = bench(files, legacy)
+            after = bench(files, current)
+            print(f"{ext} {width}x{height}: before {1000*before:7.1f}ms after {1000*after:7.1f}ms per image ({before/after:4.1f}x)")
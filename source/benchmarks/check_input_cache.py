@@ -0,0 +1,55 @@
+import os
+import sys
+import argparse
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication
+
+import remote
+from standin_server import StandinServer, Session
+
+def send(session, id, image):
+    session.inference.onRequest({"type": "img2img", "id": id, "data": {"image": image}})
+    return session.waitForType("ack", id)
+
+def check(transport, server, url):
+    inference = transport(None, url)
+    session = Session(inference)
+    session.start()
+    try:
+        image = os.urandom(remote.CACHE_THRESHOLD * 4)
+
+        send(session, 1, image)
+        assert server.inlined == 1 and server.hits == 0, "first send should be inlined"
+
+        send(session, 2, image)
+        assert server.inlined == 1 and server.hits == 1, "second send should be a reference"
+        assert inference.getStats()["cache_references"] == 1
+
+        server.forget()
+        send(session, 3, image)
+        assert server.misses == 1, "server should report the forgotten hash"
+        assert inference.getStats()["cache_misses"] == 1
+        assert server.inlined == 2, "request should be re-inlined after the miss"
+        assert session.find("cache_miss")[1] == None, "cache_miss should not reach the client"
+
+        send(session, 4, image)
+        assert server.hits == 2, "hash should be cached again after the re-inline"
+        assert not inference.referenced, "referenced requests should be released on ack"
+    finally:
+        session.stop()
+    return inference.getStats()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify the input cache inline/reference/miss exchange against the stand-in server")
+    parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    for transport in [remote.RemoteInference, remote.AsyncRemoteInference]:
+        server = StandinServer()
+        url = server.start()
+        stats = check(transport, server, url)
+        server.stop()
+        print(f"{stats['transport']:>8}: OK requests={server.requests} inlined={server.inlined} hits={server.hits} misses={server.misses}")
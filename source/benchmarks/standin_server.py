@@ -0,0 +1,188 @@
+import os
+import sys
+import asyncio
+import argparse
+import hashlib
+import threading
+import secrets
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import websockets.server
+from PyQt5.QtCore import QObject, QEventLoop, QTimer, pyqtSlot
+
+import remote
+
+PNG_1x1 = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010802000000907753de0000000c4944"
+    "4154789c636868680000030401814bd3d2100000000049454e44ae426082"
+)
+
+class StandinServer():
+    def __init__(self, host="127.0.0.1", port=0, password=remote.DEFAULT_PASSWORD, cache=True, options=None):
+        self.host = host
+        self.port = port
+        self.scheme = remote.get_cached_scheme(password)
+        self.cache = cache
+        self.options = options or {}
+        self.store = {}
+        self.results = {}
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+
+        self.requests = 0
+        self.inlined = 0
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return f"ws://{self.host}:{self.port}"
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(websockets.server.serve(self.handle, self.host, self.port, max_size=None))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    def stop(self):
+        if self.loop:
+            asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+
+    async def shutdown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def forget(self):
+        self.store = {}
+
+    async def send(self, client, response):
+        await client.send(remote.encrypt(self.scheme, response))
+
+    async def handle(self, client):
+        await self.send(client, {"type": "hello", "data": {"id": secrets.token_hex(8), "cache": self.cache}})
+        async for message in client:
+            request = remote.decrypt(self.scheme, message)
+            await self.onRequest(client, request)
+
+    async def onRequest(self, client, request):
+        typ = request.get("type", "")
+        if typ == "options":
+            await self.send(client, {"type": "options", "data": self.options})
+            return
+        if typ == "fetch":
+            result_id = request["data"]["id"]
+            if not result_id in self.results:
+                await self.send(client, {"type": "error", "data": {"message": "Unknown result"}})
+                return
+            images = self.results.pop(result_id)
+            await self.send(client, {"type": "result", "data": {"type": "PNG", "images": images}})
+            return
+        if not "id" in request or typ in {"cancel", "reconnect"}:
+            return
+
+        self.requests += 1
+        data = request.get("data", {})
+        missing = []
+        for key in remote.CACHE_KEYS:
+            if key in data:
+                data[key] = self.resolve(data[key], missing)
+        if missing:
+            self.misses += len(missing)
+            await self.send(client, {"type": "cache_miss", "id": request["id"], "data": {"hashes": missing}})
+            return
+
+        await self.send(client, {"type": "ack", "id": request["id"], "data": {"id": request["id"], "queue": 0}})
+        if data.get("temporary", False):
+            result_id = secrets.token_hex(8)
+            self.results[result_id] = [PNG_1x1]
+            await self.send(client, {"type": "temporary", "id": request["id"], "data": {"id": result_id}})
+        else:
+            await self.send(client, {"type": "result", "id": request["id"], "data": {"type": "PNG", "images": [PNG_1x1]}})
+
+    def resolve(self, value, missing):
+        if type(value) == list:
+            return [self.resolve(v, missing) for v in value]
+        if type(value) == dict and "cached" in value:
+            digest = value["cached"]
+            if not digest in self.store:
+                missing.append(digest)
+                return value
+            self.hits += 1
+            return self.store[digest]
+        if type(value) in {bytes, bytearray} and self.cache and len(value) >= remote.CACHE_THRESHOLD:
+            self.inlined += 1
+            self.store[hashlib.sha256(value).hexdigest()] = value
+        return value
+
+class Session(QObject):
+    def __init__(self, inference):
+        super().__init__()
+        self.inference = inference
+        self.responses = []
+        self.loop = None
+        self.predicate = None
+        inference.response.connect(self.onResponse)
+
+    @pyqtSlot(object)
+    def onResponse(self, response):
+        self.responses.append((time.perf_counter(), response))
+        if self.loop and self.predicate():
+            self.loop.quit()
+
+    def find(self, typ, id=None):
+        for t, response in self.responses:
+            if response["type"] == typ and (id == None or response.get("id", None) == id):
+                return t, response
+        return None, None
+
+    def waitFor(self, predicate, timeout=10):
+        if predicate():
+            return True
+        self.predicate = predicate
+        self.loop = QEventLoop()
+        QTimer.singleShot(int(timeout*1000), self.loop.quit)
+        self.loop.exec()
+        self.loop = None
+        return predicate()
+
+    def waitForType(self, typ, id=None, timeout=10):
+        if not self.waitFor(lambda: self.find(typ, id)[1] != None, timeout):
+            raise TimeoutError(f"no {typ} response for {id}")
+        return self.find(typ, id)
+
+    def idle(self, seconds):
+        self.waitFor(lambda: False, seconds)
+
+    def start(self):
+        self.inference.start()
+        self.waitForType("options")
+
+    def stop(self):
+        self.inference.stop()
+        self.inference.wait(5000)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in remote server that answers requests with a 1x1 PNG")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=28888)
+    parser.add_argument("--password", default=remote.DEFAULT_PASSWORD)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    server = StandinServer(args.host, args.port, args.password, not args.no_cache)
+    print("LISTENING", server.start())
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,12 +1,17 @@
-import glob
 import os
-import threading
+import time
 
-from PyQt5.QtCore import pyqtSlot, pyqtSignal, QObject, QThreadPool, QRunnable, QFileSystemWatcher
+from PyQt5.QtCore import pyqtSlot, pyqtSignal, QObject, QThreadPool, QRunnable, QFileSystemWatcher, QTimer
+
+SCAN_DEBOUNCE = 250
+SCAN_MAX_DELAY = 2.0
+SCAN_WORKERS = 2
 
 class WatcherRunnableSignals(QObject):
     result = pyqtSignal(str, list, list)
+    removed = pyqtSignal(str, list)
     finished = pyqtSignal(str, int)
+    aborted = pyqtSignal(str)
     def __init__(self, folder):
         super().__init__()
         self.stopping = False
@@ -17,40 +22,71 @@ class WatcherRunnableSignals(QObject):
         if folder == self.folder:
             self.stopping = True
 
-class WatcherRunnable(threading.Thread):
-    def __init__(self, folder):
+def scanFolder(folder):
+    stats = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or not "." in entry.name:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            stats[os.path.abspath(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+    order = sorted(stats, key=lambda f: (stats[f][0], f), reverse=True)
+    idxs = {f: len(order)-1-i for i, f in enumerate(order)}
+    return stats, idxs
+
+class WatcherRunnable(QRunnable):
+    def __init__(self, folder, snapshot=None):
         super().__init__()
         self.signals = WatcherRunnableSignals(folder)
         self.folder = folder
-        self.daemon = True
+        self.previous = snapshot
+        self.snapshot = None
+        self.elapsed = 0
+        self.setAutoDelete(False)
     
     def run(self):
+        start = time.perf_counter()
         try:
-            files = glob.glob(os.path.join(self.folder, "*.*"))
-            files = sorted(files, key = os.path.getmtime, reverse=True)
+            stats, idxs = scanFolder(self.folder)
+
+            if self.previous:
+                oldStats, oldIdxs = self.previous
+                removed = [f for f in oldStats if not f in stats]
+                changed = [f for f in idxs if oldIdxs.get(f, None) != idxs[f] or oldStats.get(f, None) != stats[f]]
+            else:
+                removed = []
+                changed = list(idxs)
+            changed.sort(key=lambda f: idxs[f], reverse=True)
+
+            if removed and not self.signals.stopping:
+                self.signals.removed.emit(self.folder, removed)
 
-            file_batch = []
-            idx_batch = []
             batch_size = 128
-            for i, file in enumerate(files):
+            for i in range(0, len(changed), batch_size):
                 if self.signals.stopping:
-                    return
-                file_batch += [os.path.abspath(file)]
-                idx_batch += [len(files)-1-i]
-                if len(file_batch) >= batch_size or i == len(files) - 1:
-                    self.signals.result.emit(self.folder, file_batch, idx_batch)
-                    file_batch = []
-                    idx_batch = []
+                    break
+                file_batch = changed[i:i+batch_size]
+                self.signals.result.emit(self.folder, file_batch, [idxs[f] for f in file_batch])
             
             if not self.signals.stopping:
-                self.signals.finished.emit(self.folder, len(files))
+                self.snapshot = (stats, idxs)
+                self.elapsed = time.perf_counter() - start
+                self.signals.finished.emit(self.folder, len(idxs))
+                return
         except Exception:
-            return
+            pass
+        self.signals.aborted.emit(self.folder)
 
 class Watcher(QObject):
     started = pyqtSignal(str)
     parent_changed = pyqtSignal(str)
     folder_changed = pyqtSignal(str, list, list)
+    folder_removed = pyqtSignal(str, list)
     file_changed = pyqtSignal(str)
     finished = pyqtSignal(str, int)
     kill = pyqtSignal(str)
@@ -65,9 +101,27 @@ class Watcher(QObject):
 
         self.folders = set()
         self.parents = {}
+        self.snapshots = {}
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(SCAN_WORKERS)
 
-        self.pool = QThreadPool.globalInstance()
         self.running = {}
+        self.dying = []
+        self.queue = []
+        self.dirty = {}
+        self.priority = None
+
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(SCAN_DEBOUNCE)
+        self.debounce.timeout.connect(self.onDebounce)
+
+        self.events = 0
+        self.coalesced = 0
+        self.scans = 0
+        self.scanTime = 0
+        self.scanMax = 0
 
         Watcher.instance = self
 
@@ -75,6 +129,10 @@ class Watcher(QObject):
 
     def wait(self):
         self.stopping = True
+        self.debounce.stop()
+        self.queue = []
+        for folder in list(self.running.keys()):
+            self.kill.emit(folder)
         self.pool.waitForDone()
 
     @pyqtSlot(str)
@@ -104,6 +162,16 @@ class Watcher(QObject):
         self.kill.emit(folder)
 
         self.folders.remove(folder)
+        self.snapshots.pop(folder, None)
+        self.dirty.pop(folder, None)
+        if folder in self.queue:
+            self.queue.remove(folder)
+        if folder in self.running:
+            # the scan keeps its pool slot until it reports back
+            runnable = self.running.pop(folder)
+            runnable.signals.result.disconnect()
+            runnable.signals.removed.disconnect()
+            self.dying += [runnable]
         parent = self.parents[folder]
         del self.parents[folder]
 
@@ -115,21 +183,88 @@ class Watcher(QObject):
         if self.stopping:
             return
 
-        if folder in self.running:
-            self.running[folder].signals.result.disconnect()
-            self.running[folder].signals.finished.disconnect()
-            self.kill.emit(folder)
+        self.dirty.pop(folder, None)
+        if folder in self.queue:
+            self.coalesced += 1
+        else:
+            self.queue += [folder]
+        self.schedule()
+
+    def schedule(self):
+        while not self.stopping and len(self.running) + len(self.dying) < SCAN_WORKERS:
+            waiting = [f for f in self.queue if not f in self.running]
+            if not waiting:
+                return
+            folder = self.priority if self.priority in waiting else waiting[0]
+            self.queue.remove(folder)
+            self.scan(folder)
 
-        watcher = WatcherRunnable(folder)
+    def scan(self, folder):
+        watcher = WatcherRunnable(folder, self.snapshots.get(folder, None))
         watcher.signals.result.connect(self.onWatcherResult)
+        watcher.signals.removed.connect(self.onWatcherRemoved)
         watcher.signals.finished.connect(self.onWatcherFinished)
+        watcher.signals.aborted.connect(self.onWatcherAborted)
         self.kill.connect(watcher.signals.die)
 
         self.running[folder] = watcher
 
-        watcher.start()
+        self.pool.start(watcher)
         self.started.emit(folder)
+
+    def release(self, signals):
+        for runnable in list(self.running.values()) + self.dying:
+            if runnable.signals == signals:
+                break
+        else:
+            return
+        if runnable in self.dying:
+            self.dying.remove(runnable)
+        else:
+            del self.running[runnable.folder]
+        self.kill.disconnect(runnable.signals.die)
+
+    def markDirty(self, folder):
+        self.events += 1
+        now = time.monotonic()
+        if folder in self.dirty or folder in self.queue:
+            self.coalesced += 1
+        if not folder in self.dirty:
+            self.dirty[folder] = now
+        if now - min(self.dirty.values()) < SCAN_MAX_DELAY or not self.debounce.isActive():
+            self.debounce.start()
+
+    @pyqtSlot()
+    def onDebounce(self):
+        dirty = sorted(self.dirty, key=lambda f: f != self.priority)
+        self.dirty = {}
+        for folder in dirty:
+            self.watcherStart(folder)
+
+    @pyqtSlot(str)
+    def setPriority(self, folder):
+        self.priority = folder
+        self.schedule()
+
+    def stats(self):
+        return {
+            "events": self.events,
+            "coalesced": self.coalesced,
+            "scans": self.scans,
+            "scan_ms": round(self.scanTime / max(self.scans, 1) * 1000, 2),
+            "scan_max_ms": round(self.scanMax * 1000, 2),
+            "dirty": len(self.dirty),
+            "queued": len(self.queue),
+            "running": len(self.running),
+            "dying": len(self.dying)
+        }
     
+    @pyqtSlot(str)
+    def invalidate(self, folder):
+        self.snapshots.pop(folder, None)
+        if folder in self.folders:
+            self.watcherStart(folder)
+
     @pyqtSlot(str)
     def onFileChanged(self, file):
         self.file_changed.emit(file)
@@ -137,21 +272,38 @@ class Watcher(QObject):
     @pyqtSlot(str)
     def onFolderChanged(self, folder):
         if folder in self.folders:
-            self.watcherStart(folder)
+            self.markDirty(folder)
             return
         else:
             self.parent_changed.emit(folder)
             for child, parent in list(self.parents.items()):
                 if parent == folder:
                     self.watcher.addPath(child)
-                    self.watcherStart(child)
+                    self.markDirty(child)
 
     @pyqtSlot(str, int)
     def onWatcherFinished(self, folder, total):
-        if folder in self.running:
-            del self.running[folder]
-        self.finished.emit(folder, total)
+        runnable = self.running.get(folder, None)
+        live = runnable != None and runnable.signals == self.sender()
+        self.release(self.sender())
+        if live:
+            if runnable.snapshot:
+                self.snapshots[folder] = runnable.snapshot
+            self.scans += 1
+            self.scanTime += runnable.elapsed
+            self.scanMax = max(self.scanMax, runnable.elapsed)
+            self.finished.emit(folder, total)
+        self.schedule()
+
+    @pyqtSlot(str)
+    def onWatcherAborted(self, folder):
+        self.release(self.sender())
+        self.schedule()
 
     @pyqtSlot(str, list, list)
     def onWatcherResult(self, folder, files, idxs):
-        self.folder_changed.emit(folder, files, idxs)
\ No newline at end of file
+        self.folder_changed.emit(folder, files, idxs)
+
+    @pyqtSlot(str, list)
+    def onWatcherRemoved(self, folder, files):
+        self.folder_removed.emit(folder, files)
\ No newline at end of file
@@ -5,11 +5,12 @@ import json
 import bson
 import difflib
 import time
+import math
 import platform
 import urllib.parse
 IS_WIN = platform.system() == 'Windows'
 
-from PyQt5.QtCore import pyqtSlot, pyqtProperty, pyqtSignal, QObject, Qt, QEvent, QMimeData, QUrl, QSize, QThreadPool
+from PyQt5.QtCore import pyqtSlot, pyqtProperty, pyqtSignal, QObject, Qt, QEvent, QMimeData, QUrl, QSize, QThreadPool, QRunnable, QTimer
 from PyQt5.QtQuick import QQuickItem, QQuickPaintedItem
 from PyQt5.QtGui import QImage, QColor, QDrag, QDesktopServices
 from PyQt5.QtQml import qmlRegisterType
@@ -22,6 +23,7 @@ import sql
 import filesystem
 import thumbnails
 import backend
+import remote
 import config
 import wildcards
 import translation
@@ -58,6 +60,140 @@ class RemoteStatusMode(Enum):
 def get_id():
     return random.SystemRandom().randint(1, 2**31 - 1)
 
+class PreviewThrottle():
+    def __init__(self, budget=0.008, limit=16):
+        self.budget = budget
+        self.limit = limit
+        self.interval = 1
+        self.skip = 1
+        self.average = 0.0
+        self.samples = 0
+        self.counts = {}
+        self.skipped = 0
+
+    def accept(self, id):
+        count = self.counts.get(id, 0)
+        self.counts[id] = count + 1
+        if count % self.skip != 0:
+            self.skipped += 1
+            return False
+        return True
+
+    def measure(self, seconds):
+        self.average = seconds if not self.samples else self.average * 0.8 + seconds * 0.2
+        self.samples += 1
+        if self.samples < 4:
+            return
+
+        if self.average > self.budget:
+            self.interval = min(self.limit, self.interval * 2)
+            self.skip = min(4, math.ceil(self.average / self.budget))
+            self.samples = 0
+        elif self.average < self.budget / 4:
+            self.interval = max(1, self.interval // 2)
+            self.skip = max(1, self.skip - 1)
+            self.samples = 0
+
+    def apply(self, data):
+        if data.get("show_preview", None) and "preview_interval" in data:
+            data["preview_interval"] = max(int(data["preview_interval"]), self.interval)
+
+    def finish(self, id):
+        self.counts.pop(id, None)
+
+    def stats(self):
+        return {"average_ms": self.average*1000, "interval": self.interval, "skip": self.skip, "skipped": self.skipped}
+
+class ResultDecoderRunnableSignals(QObject):
+    done = pyqtSignal(int)
+
+class ResultDecoderRunnable(QRunnable):
+    def __init__(self, seq, response, key, format):
+        super().__init__()
+        self.seq = seq
+        self.response = response
+        self.key = key
+        self.format = format
+        self.superseded = False
+        self.signals = ResultDecoderRunnableSignals()
+        self.setAutoDelete(False)
+
+    def run(self):
+        if not self.superseded:
+            decoded = []
+            for d in self.response["data"][self.key]:
+                if type(d) == bytes or type(d) == bytearray:
+                    img = QImage()
+                    img.loadFromData(d, self.format)
+                    d = img
+                decoded += [d]
+            self.response["data"][self.key] = decoded
+        self.signals.done.emit(self.seq)
+
+class ResultDecoder(QObject):
+    decoded = pyqtSignal(object)
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, min(4, QThreadPool.globalInstance().maxThreadCount())))
+
+        self.seq = 0
+        self.next = 0
+        self.pending = {}
+        self.finished = set()
+        self.previews = {}
+        self.dropped = 0
+
+    def submit(self, response):
+        seq = self.seq
+        self.seq += 1
+
+        key, format = None, None
+        data = response.get("data", None)
+        if type(data) == dict:
+            if response.get("type", "") == "progress" and data.get("previews", None):
+                key, format = "previews", "jpg"
+            elif data.get("images", None) and data.get("type", None) in {"PNG", "JPEG"}:
+                key, format = "images", {"PNG": "png", "JPEG": "jpg"}[data["type"]]
+
+        if not key:
+            self.pending[seq] = response
+            self.onDone(seq)
+            return
+
+        job = ResultDecoderRunnable(seq, response, key, format)
+        job.signals.done.connect(self.onDone)
+        self.pending[seq] = job
+
+        if key == "previews":
+            id = response.get("id", -1)
+            if id in self.previews and self.previews[id].seq in self.pending:
+                self.previews[id].superseded = True
+            self.previews[id] = job
+
+        self.pool.start(job)
+
+    @pyqtSlot(int)
+    def onDone(self, seq):
+        self.finished.add(seq)
+        while self.next in self.finished:
+            self.finished.remove(self.next)
+            item = self.pending.pop(self.next)
+            self.next += 1
+
+            if type(item) == ResultDecoderRunnable:
+                if self.previews.get(item.response.get("id", -1), None) == item:
+                    del self.previews[item.response.get("id", -1)]
+                if item.superseded:
+                    del item.response["data"][item.key]
+                    self.dropped += 1
+                item = item.response
+
+            self.decoded.emit(item)
+
+    def stats(self):
+        return {"pending": len(self.pending), "dropped_previews": self.dropped}
+
 class GUI(QObject):
     statusUpdated = pyqtSignal()
     errorUpdated = pyqtSignal()
@@ -72,6 +208,7 @@ class GUI(QObject):
     aboutToQuit = pyqtSignal()
     reset = pyqtSignal(int)
     raiseToTop = pyqtSignal()
+    outputSaved = pyqtSignal(str, int, int, str)
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -112,16 +249,25 @@ class GUI(QObject):
             "swap": False, "advanced": False, "autocomplete": 1, "vocab": [], "enforce_versions": True,
             "host_enabled": False, "host_address": "127.0.0.1", "host_port": 28888, "host_tunnel": False,
             "host_read_only": True, "host_monitor": False, "tabs": [], "grid_save_all": False,
-            "scaling": False
+            "scaling": False, "remote_async": False, "gallery_index": True,
+            "thumbnail_cache": 128, "big_thumbnail_cache": 256
         })
         self._config.updated.connect(self.onConfigUpdated)
+        self.applyThumbnailConfig()
         self._remoteStatus = RemoteStatusMode.INACTIVE
         self._remoteLatency = 0
+        self._remotePool = []
 
         self._modelFolders = []
 
         self._debugJSONLogging = self._config._values.get("debug") == True
 
+        self._stats = {}
+        self._statsTimer = QTimer(self)
+        self._statsTimer.setInterval(10000)
+        self._statsTimer.timeout.connect(self.onStatsTimeout)
+        self._statsTimer.start()
+
         self.wildcards = wildcards.Wildcards(self)
         self.wildcards.updated.connect(self.wildcardsUpdated)
         self.wildcards.reload()
@@ -133,8 +279,19 @@ class GUI(QObject):
         self.syncDefaults()
 
         self.backend = backend.Backend(self)
+        self.decoder = ResultDecoder(self)
+        self.previewThrottle = PreviewThrottle()
+        self.decoder.decoded.connect(self.handleResponse)
         self.backend.response.connect(self.onResponse)
         self.backend.updated.connect(self.backendUpdated)
+        self.registerStats("remote", remote.fetchStats)
+        self.registerStats("transport", self.backend.stats)
+        self.registerStats("inputs", misc.INPUT_CACHE.stats)
+        self.registerStats("decoder", self.decoder.stats)
+        self.registerStats("previews", self.previewThrottle.stats)
+        self.registerStats("queries", self.db.stats)
+        self.registerStats("thumbnails", self.thumbnails.stats)
+        self.registerStats("scans", self.watcher.stats)
         if not parent.endpoint:
             self.backend.setEndpoint(self._config._values.get("endpoint"), self._config._values.get("password"))
 
@@ -163,6 +320,8 @@ class GUI(QObject):
         self.backend.wait()
         self.watcher.wait()
         self.signaller.wait()
+        self.db.stop()
+        self.thumbnails.stop()
     
     def registerTabs(self, tabs):
         self.tabs = tabs
@@ -251,6 +410,10 @@ class GUI(QObject):
     @pyqtSlot(str, result=bool)
     def isCached(self, file):
         return self.thumbnails.has(QUrl.fromLocalFile(file).toLocalFile(), (256,256))
+
+    @pyqtSlot(QObject, int, int, int, float)
+    def prefetchThumbnails(self, model, first, last, columns, velocity):
+        self.thumbnails.prefetcher.prefetchRows(model, first, last, columns, velocity)
     
     @pyqtProperty('QString', notify=statusUpdated)
     def statusText(self):
@@ -304,6 +467,8 @@ class GUI(QObject):
     def makeRequest(self, request):
         id = get_id()
         request["id"] = id
+        if type(request.get("data", None)) == dict:
+            self.previewThrottle.apply(request["data"])
         self.backend.makeRequest(request)
         return id
 
@@ -354,6 +519,10 @@ class GUI(QObject):
 
     @pyqtSlot(object)
     def onResponse(self, response):
+        self.decoder.submit(response)
+
+    @pyqtSlot(object)
+    def handleResponse(self, response):
         id = response.get("id", -1)
         monitor = response.get("monitor", False)
         type = response.get("type", "")
@@ -439,6 +608,10 @@ class GUI(QObject):
             self._remoteLatency = data["seconds"]
             self.statusUpdated.emit()
 
+        if type == "remote_pool":
+            self._remotePool = data["endpoints"]
+            self.statusUpdated.emit()
+
         if type == "aborted":
             self.reset.emit(id)
             self.setReady()
@@ -449,14 +622,19 @@ class GUI(QObject):
             if response['data']['rate']:
                 self._statusInfo = f"{response['data']['rate']:.2f}{response['data']['unit']}"
             self.statusUpdated.emit()
-            if "previews" in data:
+            if "previews" in data and self.previewThrottle.accept(id):
+                start = time.perf_counter()
                 self.addResult(id, "preview", data["previews"], "JPEG")
+                self.previewThrottle.measure(time.perf_counter() - start)
         
         if type == "temporary":
             self.addResult(id, "temporary", data["images"], data["type"])
             self._delayed.add(id)
             self.setReady()
 
+        if type in {"result", "error", "aborted"}:
+            self.previewThrottle.finish(id)
+
         if type == "result":
             self.addResult(id, "metadata", data["metadata"])
             self.addResult(id, "result", data["images"], data["type"])
@@ -568,8 +746,14 @@ class GUI(QObject):
     
     @pyqtSlot()
     def onConfigUpdated(self):
+        self.applyThumbnailConfig()
         self.configUpdated.emit()
 
+    def applyThumbnailConfig(self):
+        self.thumbnails.setBudget((256,256), int(self._config._values.get("thumbnail_cache")) * 1024 * 1024)
+        self.thumbnails.setBudget((640,640), int(self._config._values.get("big_thumbnail_cache")) * 1024 * 1024)
+        self.thumbnails.setStores([self.outputDirectory(), self.modelDirectory()])
+
     @pyqtProperty(str, notify=statusUpdated)
     def remoteEndpoint(self):
         endpoint = self._config._values.get("endpoint")
@@ -585,6 +769,10 @@ class GUI(QObject):
     def remoteLatency(self):
         return self._remoteLatency
 
+    @pyqtProperty(list, notify=statusUpdated)
+    def remotePool(self):
+        return self._remotePool
+
     @pyqtProperty(bool, notify=statusUpdated)
     def isRemote(self):
         return self.backend.mode == "Remote" or self.config.get("mode") == "remote"
@@ -623,6 +811,7 @@ class GUI(QObject):
         else:
             self._remoteStatus = RemoteStatusMode.INACTIVE
         self._remoteLatency = 0
+        self._remotePool = []
 
         self._statusMode = StatusMode.STARTING
         self._statusProgress = -1
@@ -678,6 +867,24 @@ class GUI(QObject):
         if mode == "bin":
             self._debugBINLogging = enabled
 
+    def registerStats(self, name, provider):
+        self._stats[name] = provider
+
+    @pyqtSlot(result='QVariant')
+    def debugStats(self):
+        stats = {}
+        for name, provider in self._stats.items():
+            try:
+                stats[name] = provider()
+            except Exception as e:
+                stats[name] = str(e)
+        return stats
+
+    @pyqtSlot()
+    def onStatsTimeout(self):
+        if self._debugJSONLogging:
+            self.backend.debugLogging("STATS", self.debugStats())
+
     @pyqtSlot()
     def debugRequest(self):
         try:
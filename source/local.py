@@ -7,8 +7,10 @@ import io
 import queue
 import threading
 import multiprocessing
+import multiprocessing.shared_memory
 import traceback
 import datetime
+import struct
 
 import platform
 IS_WIN = platform.system() == 'Windows'
@@ -18,6 +20,10 @@ from PyQt5.QtWidgets import QApplication
 
 import git
 
+RING_SIZE = 128*1024*1024
+RING_THRESHOLD = 65536
+RING_HEADER = 16
+
 def log_traceback(label):
     exc_type, exc_value, exc_tb = sys.exc_info()
     tb = "".join(traceback.format_exception(exc_type, exc_value, exc_tb))
@@ -26,6 +32,123 @@ def log_traceback(label):
     print(label, tb)
     return tb
 
+class SharedRing():
+    # the header holds the total bytes written (head) and consumed (tail). producers reserve spans under
+    # the guard, the consumer may see descriptors out of order so tail only advances over completed spans
+    def __init__(self, name=None, size=RING_SIZE):
+        if name:
+            self.memory = multiprocessing.shared_memory.SharedMemory(name=name)
+            try:
+                if multiprocessing.get_start_method() != "fork":
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(self.memory._name, "shared_memory")
+            except Exception:
+                pass
+        else:
+            self.memory = multiprocessing.shared_memory.SharedMemory(create=True, size=size+RING_HEADER)
+            struct.pack_into("QQ", self.memory.buf, 0, 0, 0)
+        self.name = self.memory.name
+        self.size = self.memory.size - RING_HEADER
+        self.owner = not name
+
+        self.transferred = 0
+        self.fallbacks = 0
+        self.completed = {}
+        self.guard = threading.Lock()
+
+    def write(self, data):
+        with self.guard:
+            return self.doWrite(data)
+
+    def doWrite(self, data):
+        n = len(data)
+        head, tail = struct.unpack_from("QQ", self.memory.buf, 0)
+        pos = head % self.size
+        pad = self.size - pos if pos + n > self.size else 0
+        if head + pad + n - tail > self.size:
+            self.fallbacks += 1
+            return data
+        start = head + pad
+        offset = RING_HEADER + start % self.size
+        self.memory.buf[offset:offset+n] = data
+        struct.pack_into("Q", self.memory.buf, 0, start + n)
+        self.transferred += n
+        return {"__ring__": (head, start, n)}
+
+    def read(self, descriptor):
+        head, start, n = descriptor["__ring__"]
+        offset = RING_HEADER + start % self.size
+        data = bytes(self.memory.buf[offset:offset+n])
+        self.completed[head] = start + n
+        tail = struct.unpack_from("Q", self.memory.buf, 8)[0]
+        while tail in self.completed:
+            tail = self.completed.pop(tail)
+        struct.pack_into("Q", self.memory.buf, 8, tail)
+        return data
+
+    @staticmethod
+    def needed(obj):
+        if type(obj) in {bytes, bytearray}:
+            return len(obj) >= RING_THRESHOLD
+        if type(obj) == dict:
+            return any(SharedRing.needed(v) for v in obj.values())
+        if type(obj) in {list, tuple}:
+            return any(SharedRing.needed(v) for v in obj)
+        return False
+
+    def pack(self, obj):
+        if type(obj) in {bytes, bytearray} and len(obj) >= RING_THRESHOLD:
+            return self.write(obj)
+        if type(obj) == dict:
+            return {k:self.pack(v) for k,v in obj.items()}
+        if type(obj) in {list, tuple}:
+            return type(obj)(self.pack(v) for v in obj)
+        return obj
+
+    def unpack(self, obj):
+        if type(obj) == dict:
+            if "__ring__" in obj:
+                return self.read(obj)
+            return {k:self.unpack(v) for k,v in obj.items()}
+        if type(obj) in {list, tuple}:
+            return type(obj)(self.unpack(v) for v in obj)
+        return obj
+
+    def close(self):
+        self.memory.close()
+        if self.owner:
+            try:
+                self.memory.unlink()
+            except Exception:
+                pass
+
+    def stats(self):
+        return {"size": self.size, "transferred": self.transferred, "fallbacks": self.fallbacks}
+
+class RingQueue():
+    def __init__(self, queue, ring):
+        self.queue = queue
+        self.ring = ring
+
+    def put(self, obj):
+        if self.ring:
+            obj = self.ring.pack(obj)
+        self.queue.put(obj)
+
+def create_ring():
+    try:
+        return SharedRing()
+    except Exception:
+        return None
+
+def attach_ring(name):
+    if not name:
+        return None
+    try:
+        return SharedRing(name)
+    except Exception:
+        return None
+
 class InferenceProcessThread(threading.Thread):
     def __init__(self, requests, responses, model_directory):
         super().__init__()
@@ -138,16 +261,21 @@ class InferenceProcessThread(threading.Thread):
         self.cancelled.add(id)
 
 class InferenceProcess(multiprocessing.Process):
-    def __init__(self, requests, responses, model_directory):
+    def __init__(self, requests, responses, model_directory, request_ring=None, response_ring=None):
         super().__init__()
         self.stopping = False
         self.requests = requests
         self.responses = responses
         self.model_directory = model_directory
+        self.request_ring = request_ring
+        self.response_ring = response_ring
 
     def run(self):
         inference_requests = queue.Queue()
 
+        request_ring = attach_ring(self.request_ring)
+        self.responses = RingQueue(self.responses, attach_ring(self.response_ring))
+
         try:
             self.inference = InferenceProcessThread(inference_requests, self.responses, self.model_directory)
         except Exception as e:
@@ -165,6 +293,14 @@ class InferenceProcess(multiprocessing.Process):
             
             try:
                 request = self.requests.get(True, 1)
+                if request_ring:
+                    request = request_ring.unpack(request)
+                if request["type"] == "ring":
+                    if "request" in request["data"]:
+                        request_ring = attach_ring(request["data"]["request"])
+                    if "response" in request["data"]:
+                        self.responses.ring = attach_ring(request["data"]["response"])
+                    continue
                 if request["type"] == "cancel":
                     self.inference.cancel(request["data"]["id"])
                 if request["type"] == "stop":
@@ -190,15 +326,26 @@ class LocalInference(QThread):
         self.stopping = False
         self.requests = multiprocessing.Queue(16)
         self.responses = multiprocessing.Queue(16)
+
+        self.request_ring = None
+        self.response_ring = None
+
         self.inference = InferenceProcess(self.requests, self.responses, self.gui.modelDirectory())
+        self.outgoing = RingQueue(self.requests, None)
 
     def run(self):
+        # rings are created after the fork, the child has to share our tracker to not adopt them as its own
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+        except Exception:
+            pass
         self.inference.start()
         while not self.stopping:
             try:
-                QApplication.processEvents()
-                QThread.msleep(10)
-                response = self.responses.get(False)
+                response = self.responses.get(True, 0.5)
+                if self.response_ring:
+                    response = self.response_ring.unpack(response)
                 self.onResponse(response)
             except queue.Empty:
                 pass
@@ -213,9 +360,36 @@ class LocalInference(QThread):
             self.inference.terminate()
         print("STOPPED")
 
+    def wait(self, timeout=None):
+        done = super().wait() if timeout == None else super().wait(timeout)
+        for ring in [self.request_ring, self.response_ring]:
+            if ring and done:
+                ring.close()
+        return done
+
+    def createRing(self, direction):
+        ring = create_ring()
+        if ring:
+            self.requests.put({"type": "ring", "data": {direction: ring.name}})
+        return ring
+
     @pyqtSlot(object)
     def onRequest(self, request):
-        self.requests.put(request)
+        # rings are only allocated once something would actually use them
+        if not self.response_ring and not request["type"] in {"options", "cancel", "stop"}:
+            self.response_ring = self.createRing("response")
+        if not self.request_ring and SharedRing.needed(request):
+            self.request_ring = self.createRing("request")
+            self.outgoing.ring = self.request_ring
+        self.outgoing.put(request)
+
+    def getStats(self):
+        stats = {"transport": "local"}
+        if self.request_ring:
+            stats["request_ring"] = self.request_ring.stats()
+        if self.response_ring:
+            stats["response_ring"] = self.response_ring.stats()
+        return stats
 
     def onResponse(self, response):
         self.response.emit(response)
\ No newline at end of file
@@ -13,7 +13,8 @@ from PyQt5.QtGui import QImage, QPainter, QColor, QFont, QTextOption
 from PyQt5.QtQml import qmlRegisterUncreatableType
 
 import parameters
-from misc import encodeImage, decodeImage, SuggestionManager
+import thumbnails
+from misc import encodeImage, decodeImage, SuggestionManager, INPUT_CACHE
 
 class InputRole(enum.Enum):
     IMAGE = 1
@@ -30,9 +31,11 @@ class OutputWriterSignals(QObject):
     done = pyqtSignal(str)
 
 class OutputWriter(threading.Thread):
-    def __init__(self, img, metadata, folder, file=None):
+    def __init__(self, img, metadata, folder, file=None, thumbnail=False):
         super().__init__()
         self.signals = OutputWriterSignals()
+        self.thumbnail = thumbnail
+        self.parameters = metadata.get("parameters", "") if metadata else ""
 
         m = PIL.PngImagePlugin.PngInfo()
         if metadata:
@@ -66,6 +69,13 @@ class OutputWriter(threading.Thread):
         self.img.save(self.tmp, format="PNG", pnginfo=self.metadata)
 
         os.replace(self.tmp, self.file)
+
+        if self.thumbnail and thumbnails.ThumbnailStorage.instance:
+            try:
+                thumbnails.ThumbnailStorage.instance.prime(os.path.abspath(self.file), self.img)
+            except Exception:
+                pass
+
         self.signals.done.emit(self.file)
 
 class BuilderRunnable(threading.Thread):
@@ -189,13 +199,13 @@ class RequestManager(QObject):
                 if type(data[k][i]) == str:
                     if not filename:
                         filename = data[k][i]
-                    data[k][i] = encodeImage(QImage(data[k][i]))
+                    data[k][i] = INPUT_CACHE.encodeFile(data[k][i])
                 elif type(data[k][i]) == list:
                     for j in range(len(data[k][i])):
                         if type(data[k][i][j]) == str:
                             if not filename:
                                 filename = data[k][i][j]
-                            data[k][i][j] = encodeImage(QImage(data[k][i][j]))
+                            data[k][i][j] = INPUT_CACHE.encodeFile(data[k][i][j])
         if filename:
             filename = filename.rsplit(os.path.sep, 1)[-1].rsplit(".", 1)[0]
 
@@ -219,7 +229,7 @@ class RequestManager(QObject):
                 data = []
                 if i._role == InputRole.IMAGE:
                     if i._image and not i._image.isNull():
-                        data += [encodeImage(i._originalCrop or i._original)]
+                        data += [INPUT_CACHE.encodeImage(i._originalCrop or i._original)]
                     if i._files:
                         for f in i._files[::-1]:
                             data += [i.getFilePath(f)]
@@ -228,7 +238,7 @@ class RequestManager(QObject):
                 if i._role == InputRole.MASK or (i._role == InputRole.CONTROL and i._control_mode == "Inpaint"):
                     if i._linked:
                         if i._image and not i._image.isNull():
-                            data += [encodeImage(i._image)]
+                            data += [INPUT_CACHE.encodeImage(i._image)]
                         if i._files:
                             for f in i._files[::-1]:
                                 data += [i.getFilePath(f)]
@@ -238,7 +248,7 @@ class RequestManager(QObject):
                             data = []
                 if i._role == InputRole.SUBPROMPT:
                     if i._image and not i._image.isNull():
-                        data += [[encodeImage(a) for a in i.getAreas()]]
+                        data += [[INPUT_CACHE.encodeImage(a) for a in i.getAreas()]]
                     if data:
                         found[i] = data
                         if i._linked:
@@ -256,7 +266,7 @@ class RequestManager(QObject):
                     if model == "Inpaint" and i._linked:
                         k = i._linked
                     if k._image and not k._image.isNull():
-                        data += [(model, opts, encodeImage(k._image or k._original))]
+                        data += [(model, opts, INPUT_CACHE.encodeImage(k._image or k._original))]
                     if k._files:
                         for f in k._files[::-1]:
                             data += [(model, opts, k.getFilePath(f))]
@@ -265,7 +275,7 @@ class RequestManager(QObject):
                 if i._role == InputRole.SEGMENTATION:
                     opts = i.getSegmentationArgs()
                     if i._image and not i._image.isNull():
-                        data += [(encodeImage(i._originalCrop or i._original), opts)]
+                        data += [(INPUT_CACHE.encodeImage(i._originalCrop or i._original), opts)]
                     if i._files:
                         for f in i._files[::-1]:
                             data += [(i.getFilePath(f), opts)]
@@ -524,7 +534,7 @@ class RequestManager(QObject):
         if recipe := parameters.formatRecipe(metadata):
             formatted["recipe"] = recipe
 
-        writer = OutputWriter(image, formatted, os.path.join(self.gui.outputDirectory(), folder))
+        writer = OutputWriter(image, formatted, os.path.join(self.gui.outputDirectory(), folder), thumbnail=True)
         writer.signals.done.connect(self.onSave)
         self.writers[writer.file] = writer
         writer.start()
@@ -533,7 +543,10 @@ class RequestManager(QObject):
     @pyqtSlot(str)
     def onSave(self, file):
         if file in self.writers:
-            del self.writers[file]
+            writer = self.writers.pop(file)
+            if writer.thumbnail:
+                width, height = writer.img.size
+                self.gui.outputSaved.emit(os.path.abspath(file), width, height, writer.parameters)
 
     def normalResult(self, id, out, name):
         if name in {"preview", "temporary"}:
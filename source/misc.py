@@ -5,6 +5,9 @@ import math
 import platform
 import subprocess
 import time
+import hashlib
+import threading
+import collections
 IS_WIN = platform.system() == 'Windows'
 
 #NOTE: imported by launcher
@@ -446,6 +449,72 @@ def decodeImage(data):
     img.loadFromData(data, "png")
     return img
 
+class InputCache():
+    def __init__(self, limit=512*1024*1024):
+        self.limit = limit
+        self.total = 0
+        self.entries = collections.OrderedDict()
+        self.hashes = {}
+        self.guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        with self.guard:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+            return None
+
+    def insert(self, key, data, digest):
+        with self.guard:
+            if key in self.entries:
+                return self.entries[key][0]
+            self.entries[key] = (data, digest)
+            self.hashes[id(data)] = (data, digest)
+            self.total += len(data)
+            while self.total > self.limit and len(self.entries) > 1:
+                _, (old, _) = self.entries.popitem(last=False)
+                self.total -= len(old)
+                if id(old) in self.hashes and self.hashes[id(old)][0] is old:
+                    del self.hashes[id(old)]
+            return data
+
+    def encodeImage(self, img):
+        key = ("image", img.cacheKey())
+        data = self.lookup(key)
+        if data == None:
+            data = encodeImage(img)
+            data = self.insert(key, data, hashlib.sha256(data).hexdigest())
+        return data
+
+    def encodeFile(self, file):
+        try:
+            stat = os.stat(file)
+            key = ("file", file, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return encodeImage(QImage(file))
+        data = self.lookup(key)
+        if data == None:
+            data = encodeImage(QImage(file))
+            data = self.insert(key, data, hashlib.sha256(data).hexdigest())
+        return data
+
+    def hash(self, data):
+        with self.guard:
+            entry = self.hashes.get(id(data), None)
+            if entry and entry[0] is data:
+                return entry[1]
+        return hashlib.sha256(data).hexdigest()
+
+    def stats(self):
+        with self.guard:
+            return {"entries": len(self.entries), "bytes": self.total, "hits": self.hits, "misses": self.misses}
+
+INPUT_CACHE = InputCache()
+
 def cropImage(img, size, offset_x = 0, offset_y = 0, scale = 1, info=False):
     in_z = img.size()
         
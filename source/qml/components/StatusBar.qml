@@ -50,4 +50,25 @@ Rectangle {
         pointSize: 9.8
         color: COMMON.fg1_5
     }
+
+    SText {
+        anchors.fill: parent
+        anchors.topMargin: 2
+        anchors.bottomMargin: 4
+        anchors.rightMargin: 8
+        visible: GUI.remotePool.length > 1
+        verticalAlignment: Text.AlignVCenter
+        horizontalAlignment: Text.AlignRight
+        text: {
+            var out = []
+            for(var i = 0; i < GUI.remotePool.length; i++) {
+                var e = GUI.remotePool[i]
+                var name = e.endpoint.replace(/^wss?:\/\//, "")
+                out.push(e.alive ? (name + ": " + e.rate + "/min (" + e.queue + ")") : (name + ": -"))
+            }
+            return out.join("  ")
+        }
+        pointSize: 9
+        color: COMMON.fg2
+    }
 }
\ No newline at end of file
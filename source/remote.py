@@ -1,6 +1,8 @@
 import queue
+import asyncio
 import multiprocessing
 import websockets.sync.client
+import websockets.client
 import websockets.exceptions
 import bson
 import os
@@ -11,7 +13,7 @@ import math
 import time
 import threading
 
-from PyQt5.QtCore import pyqtSlot, pyqtSignal, QThread
+from PyQt5.QtCore import pyqtSlot, pyqtSignal, QObject, QThread
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QImage
 
@@ -21,8 +23,17 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.exceptions import InvalidTag
 
+from misc import INPUT_CACHE
+
 DEFAULT_PASSWORD = "qDiffusion"
 FRAGMENT_SIZE = 524288
+FETCH_POOL_SIZE = 4
+FETCH_IDLE_TIMEOUT = 30
+FETCH_RETRIES = 4
+FETCH_BACKOFF = 0.25
+FETCH_TIMEOUT = 30
+CACHE_KEYS = {"image", "mask", "cn_image", "area"}
+CACHE_THRESHOLD = 65536
 
 def log_traceback(label):
     exc_type, exc_value, exc_tb = sys.exc_info()
@@ -44,6 +55,32 @@ def get_scheme(password):
     )
     return AESGCM(kdf.derive(password))
 
+class SchemeCache():
+    def __init__(self):
+        self.schemes = {}
+        self.guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, password):
+        with self.guard:
+            if password in self.schemes:
+                self.hits += 1
+                return self.schemes[password]
+            self.misses += 1
+            scheme = get_scheme(password)
+            self.schemes[password] = scheme
+            return scheme
+
+    def stats(self):
+        with self.guard:
+            return {"size": len(self.schemes), "hits": self.hits, "misses": self.misses}
+
+SCHEMES = SchemeCache()
+
+def get_cached_scheme(password):
+    return SCHEMES.get(password)
+
 def encrypt(scheme, obj):
     data = bson.dumps(obj)
     if scheme:
@@ -142,6 +179,153 @@ class RemoteHeartbeat(QThread):
         
         self.latency.emit(0)
 
+class FetchPool():
+    pools = {}
+    guard = threading.Lock()
+
+    @staticmethod
+    def get(endpoint, password):
+        with FetchPool.guard:
+            key = (endpoint, password)
+            if not key in FetchPool.pools:
+                FetchPool.pools[key] = FetchPool(endpoint, password)
+            return FetchPool.pools[key]
+
+    @staticmethod
+    def stats():
+        with FetchPool.guard:
+            pools = list(FetchPool.pools.values())
+        return {p.endpoint: p.getStats() for p in pools}
+
+    def __init__(self, endpoint, password, size=FETCH_POOL_SIZE):
+        self.endpoint = endpoint
+        self.password = password
+        self.size = size
+        self.jobs = queue.Queue()
+        self.workers = []
+        self.idle = 0
+        self.lock = threading.Lock()
+
+        self.connections = 0
+        self.fetches = 0
+        self.reused = 0
+        self.retries = 0
+        self.failures = 0
+
+    def fetch(self, result_id, request_id, callback):
+        with self.lock:
+            self.jobs.put((result_id, request_id, callback))
+            self.workers = [w for w in self.workers if w.is_alive()]
+            if self.jobs.qsize() > self.idle and len(self.workers) < self.size:
+                worker = threading.Thread(target=self.work, daemon=True)
+                self.workers += [worker]
+                self.idle += 1
+                worker.start()
+
+    def connect(self):
+        client = websockets.sync.client.connect(self.endpoint, open_timeout=2, max_size=None, close_timeout=0)
+        with self.lock:
+            self.connections += 1
+        return client
+
+    def disconnect(self, client):
+        try:
+            client.close()
+            client.close_socket()
+        except Exception:
+            pass
+
+    def work(self):
+        scheme = get_cached_scheme(self.password)
+        client = None
+        while True:
+            try:
+                job = self.jobs.get(True, FETCH_IDLE_TIMEOUT)
+            except queue.Empty:
+                with self.lock:
+                    if self.jobs.empty():
+                        self.idle -= 1
+                        self.workers.remove(threading.current_thread())
+                        break
+                continue
+
+            with self.lock:
+                self.idle -= 1
+
+            result_id, request_id, callback = job
+            response, reused, error = None, False, None
+            for attempt in range(FETCH_RETRIES):
+                if attempt:
+                    time.sleep(FETCH_BACKOFF * 2 ** (attempt - 1))
+                    with self.lock:
+                        self.retries += 1
+                reused = client != None
+                try:
+                    if not client:
+                        client = self.connect()
+                    response = self.doFetch(client, scheme, result_id)
+                    break
+                except Exception as e:
+                    error = e
+                    if client:
+                        self.disconnect(client)
+                        client = None
+
+            with self.lock:
+                self.idle += 1
+                if response == None or response["type"] != "result":
+                    self.failures += 1
+                else:
+                    self.fetches += 1
+                    if reused:
+                        self.reused += 1
+
+            if response == None:
+                response = {"type": "error", "data": {"message": f"Failed to fetch result: {error}"}}
+
+            response["id"] = request_id
+            callback(response)
+
+        if client:
+            self.disconnect(client)
+
+    def doFetch(self, client, scheme, result_id):
+        request = {"type": "fetch", "data": {"id": result_id}}
+        client.send(encrypt(scheme, request))
+
+        deadline = time.time() + FETCH_TIMEOUT
+        while True:
+            response = decrypt(scheme, client.recv(max(0, deadline - time.time())))
+            if response["type"] == "result":
+                break
+            if response["type"] in {"error", "aborted"}:
+                return response
+
+        images = []
+        typ = {"PNG": "png", "JPEG": "jpg"}[response["data"]["type"]]
+        for data in response["data"]["images"]:
+            image = QImage()
+            image.loadFromData(data, typ)
+            images += [image]
+        response["data"]["images"] = images
+        return response
+
+    def getStats(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "workers": len(self.workers),
+                "queued": self.jobs.qsize(),
+                "connections": self.connections,
+                "fetches": self.fetches,
+                "retries": self.retries,
+                "failures": self.failures,
+                "reuse_rate": self.reused/self.fetches if self.fetches else 0.0
+            }
+
+def fetchStats():
+    return {"schemes": SCHEMES.stats(), "pools": FetchPool.stats()}
+
 class RemoteInference(QThread):
     kill = pyqtSignal()
     response = pyqtSignal(object)
@@ -160,8 +344,18 @@ class RemoteInference(QThread):
             password = DEFAULT_PASSWORD
         self.password = password
         self.id = None
+        self.client_id = None
         self.uploads = {}
 
+        self.queued = {}
+        self.dispatched = []
+
+        self.cache_enabled = False
+        self.cached = set()
+        self.referenced = {}
+        self.references = 0
+        self.cache_misses = 0
+
     def connect(self):
         if self.client:
             return
@@ -210,46 +404,29 @@ class RemoteInference(QThread):
             raise websockets.exceptions.ConnectionClosedError(None, None)
     
     def run(self):
-        self.scheme = get_scheme(self.password)
+        self.scheme = get_cached_scheme(self.password)
         self.connect()
-        client_id = None
 
         while self.client and not self.stopping:
             try:
                 while True:
                     try:
                         data = self.client.recv(0)
-                        response = decrypt(self.scheme, data)
-                        if response["type"] == "hello":
-                            if not client_id:
-                                client_id = response["data"]["id"]
-                            else:
-                                self.requests.put({"type": "reconnect", "data": {"id": client_id}})
-                        if response["type"] == "temporary":
-                            self.fetch(response["data"]["id"], response["id"])
-
-                        self.onResponse(response)
+                        self.onMessage(data)
                         QApplication.processEvents()
                     except TimeoutError:
                         break
                 
                 try:
                     request = self.requests.get(False)
+                    queued = self.dequeued(request)
 
                     if request["type"] == "upload":
-                        file = request["data"]["file"]
-                        if not file in self.uploads:
-                            self.uploads[file] = RemoteInferenceUpload(self.requests, request["data"]["type"], request["id"], file)
-                            self.uploads[file].done.connect(self.onUploadDone)
-                            self.kill.connect(self.uploads[file].stop)
-                            self.uploads[file].start()
-                            
+                        self.startUpload(request)
                         continue
 
-                    data = encrypt(self.scheme, request)
-                    data = [data[i:min(i+FRAGMENT_SIZE,len(data))] for i in range(0, len(data), FRAGMENT_SIZE)]
-
-                    self.client.send(data)
+                    self.client.send(self.encode(request))
+                    self.onSent(queued)
                     QApplication.processEvents()
                 except queue.Empty:
                     QThread.msleep(5)
@@ -279,6 +456,90 @@ class RemoteInference(QThread):
             self.client.close()
             self.terminateConnection(errored=False)
 
+    def onMessage(self, data):
+        response = decrypt(self.scheme, data)
+        if response["type"] == "cache_miss":
+            self.onCacheMiss(response)
+            return
+        if response["type"] == "ack":
+            self.referenced.pop(response["data"].get("id", None), None)
+        if response["type"] in {"error", "aborted"}:
+            self.referenced.pop(response.get("id", None), None)
+        if response["type"] == "hello":
+            self.cache_enabled = response["data"].get("cache", False) == True
+            if not self.client_id:
+                self.client_id = response["data"]["id"]
+            else:
+                self.requests.put({"type": "reconnect", "data": {"id": self.client_id}})
+        if response["type"] == "temporary":
+            self.fetch(response["data"]["id"], response["id"])
+
+        self.onResponse(response)
+
+    def onCacheMiss(self, response):
+        request = self.referenced.pop(response["id"], None)
+        self.cached.difference_update(response["data"]["hashes"])
+        self.cache_misses += 1
+        if request:
+            self.requests.put(request)
+
+    def referenceInputs(self, request):
+        if not self.cache_enabled or not "id" in request or not type(request.get("data", None)) == dict:
+            return request
+
+        found = []
+        def reference(value):
+            if type(value) in {bytes, bytearray} and len(value) >= CACHE_THRESHOLD:
+                digest = INPUT_CACHE.hash(value)
+                if digest in self.cached:
+                    found.append(digest)
+                    return {"cached": digest}
+                self.cached.add(digest)
+            elif type(value) == list:
+                return [reference(v) for v in value]
+            return value
+
+        data = {k:(reference(v) if k in CACHE_KEYS else v) for k, v in request["data"].items()}
+        if not found:
+            return request
+
+        self.references += len(found)
+        self.referenced[request["id"]] = request
+        return {**request, "data": data}
+
+    def encode(self, request):
+        request = self.referenceInputs(request)
+        data = encrypt(self.scheme, request)
+        return [data[i:min(i+FRAGMENT_SIZE,len(data))] for i in range(0, len(data), FRAGMENT_SIZE)]
+
+    def startUpload(self, request):
+        file = request["data"]["file"]
+        if not file in self.uploads:
+            self.uploads[file] = RemoteInferenceUpload(self.requests, request["data"]["type"], request["id"], file)
+            self.uploads[file].done.connect(self.onUploadDone)
+            self.kill.connect(self.uploads[file].stop)
+            self.uploads[file].start()
+
+    def dequeued(self, request):
+        return self.queued.pop(id(request), (None, None))[1]
+
+    def onSent(self, queued):
+        if queued != None:
+            self.dispatched += [time.perf_counter() - queued]
+            if len(self.dispatched) > 100:
+                self.dispatched.pop(0)
+
+    def getStats(self):
+        dispatched = list(self.dispatched)
+        return {
+            "transport": "polling",
+            "dispatch_ms": 1000*sum(dispatched)/len(dispatched) if dispatched else 0.0,
+            "dispatch_max_ms": 1000*max(dispatched) if dispatched else 0.0,
+            "cache_enabled": self.cache_enabled,
+            "cache_references": self.references,
+            "cache_misses": self.cache_misses
+        }
+
     @pyqtSlot()
     def stop(self):
         for file in self.uploads:
@@ -287,6 +548,7 @@ class RemoteInference(QThread):
 
     @pyqtSlot(object)
     def onRequest(self, request):
+        self.queued[id(request)] = (request, time.perf_counter())
         self.requests.put(request)
 
     def onResponse(self, response):
@@ -303,48 +565,360 @@ class RemoteInference(QThread):
         self.onResponse({"type": "remote_latency", "data": {"seconds": seconds}})
 
     def fetch(self, result_id, request_id):
-        def do_fetch(endpoint, password, result_id, request_id, callback):
-            scheme = get_scheme(password)
-            client = None
-            while True:
-                try:
-                    client = websockets.sync.client.connect(endpoint, open_timeout=2, max_size=None, close_timeout=0)
-                    break
-                except Exception:
-                    continue
-                
-            request = {"type": "fetch", "data": {"id": result_id}}
-            data = encrypt(scheme, request)
+        FetchPool.get(self.endpoint, self.password).fetch(result_id, request_id, self.onResponse)
+
+class AsyncRequestQueue():
+    def __init__(self):
+        self.loop = None
+        self.queue = None
+        self.pending = []
+        self.count = 0
+        self.guard = threading.Lock()
+
+    def attach(self, loop):
+        with self.guard:
+            self.loop = loop
+            self.queue = asyncio.Queue()
+            for request in self.pending:
+                self.queue.put_nowait(request)
+            self.pending = []
+
+    def put(self, request):
+        with self.guard:
+            self.count += 1
+            if self.loop:
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, request)
+            else:
+                self.pending += [request]
+
+    def empty(self):
+        return self.count == 0
+
+    async def get(self):
+        request = await self.queue.get()
+        with self.guard:
+            self.count -= 1
+        return request
+
+class AsyncRemoteInference(RemoteInference):
+    def __init__(self, gui, endpoint, password=None):
+        super().__init__(gui, endpoint, password)
+        self.requests = AsyncRequestQueue()
+        self.loop = None
+        self.stopped = None
+
+    def run(self):
+        self.scheme = get_cached_scheme(self.password)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.stopped = asyncio.Event()
+        self.loop = loop
+        self.requests.attach(loop)
+        try:
+            loop.run_until_complete(self.session())
+        finally:
+            self.loop = None
+            loop.close()
+
+    async def connectAsync(self, timeout=None):
+        start = time.time()
+        while not self.stopping:
             try:
-                client.send(data)
+                return await websockets.client.connect(self.endpoint, open_timeout=2, max_size=None)
+            except (TimeoutError, asyncio.TimeoutError):
+                pass
             except Exception as e:
-                print(e)
+                if timeout == None:
+                    if type(e) == ConnectionRefusedError:
+                        self.onResponse({"type": "remote_error", "data": {"message": "Connection refused"}})
+                    else:
+                        self.onResponse({"type": "remote_error", "data": {"message": str(e)}})
+                    return None
+            if timeout != None and time.time() - start > timeout:
+                return None
+        return None
+
+    async def session(self):
+        self.onResponse({"type": "status", "data": {"message": "Connecting"}})
+        self.client = await self.connectAsync()
+        if not self.client or self.stopping:
+            return
+        self.onResponse({"type": "status", "data": {"message": "Connected"}})
+        self.requests.put({"type":"options"})
+
+        heartbeat = asyncio.create_task(self.heartbeat())
+        stopper = asyncio.create_task(self.stopped.wait())
+
+        while self.client and not self.stopping:
+            sender = asyncio.create_task(self.sendLoop())
+            receiver = asyncio.create_task(self.recvLoop())
+            done, _ = await asyncio.wait([sender, receiver, stopper], return_when=asyncio.FIRST_COMPLETED)
+            sender.cancel()
+            receiver.cancel()
+
+            if stopper in done:
+                break
+
+            try:
+                for task in done:
+                    task.result()
+            except websockets.exceptions.ConnectionClosedOK:
+                self.onResponse({"type": "remote_error", "data": {"message": "Connection closed"}})
+                break
+            except websockets.exceptions.ConnectionClosedError as e:
+                if not e.rcvd and not e.sent:
+                    self.onResponse({"type": "status", "data": {"message": "Reconnecting"}})
+                    self.client = await self.connectAsync(60)
+                    if self.client:
+                        if not self.stopping:
+                            self.onResponse({"type": "status", "data": {"message": "Reconnected"}})
+                        continue
+                    else:
+                        self.onResponse({"type": "remote_error", "data": {"message": "Connection lost"}})
+                else:
+                    self.onResponse({"type": "remote_error", "data": {"message": "Connection aborted"}})
+                break
+            except Exception as e:
+                if type(e) == InvalidTag or type(e) == IndexError:
+                    self.onResponse({"type": "remote_error", "data": {"message": "Incorrect password"}})
+                else:
+                    self.onResponse({"type": "remote_error", "data": {"message": str(e)}})
+                    log_traceback("REMOTE")
+                break
+
+        heartbeat.cancel()
+        stopper.cancel()
+        if self.client:
+            await self.client.close()
+            self.client = None
+
+    async def recvLoop(self):
+        while True:
+            data = await self.client.recv()
+            self.onMessage(data)
+
+    async def sendLoop(self):
+        while True:
+            request = await self.requests.get()
+            queued = self.dequeued(request)
+            if request["type"] == "upload":
+                self.startUpload(request)
+                continue
+            await self.client.send(self.encode(request))
+            self.onSent(queued)
+
+    async def heartbeat(self):
+        latencies = []
+        last = time.time()
+        ping_interval = 1
+        wait_interval = 10
+        while True:
+            start = time.time()
+            try:
+                pong = await self.client.ping()
+                await asyncio.wait_for(pong, wait_interval)
+                last = time.time()
+                latencies += [last-start]
+                if len(latencies) > 10:
+                    latencies.pop(0)
+                self.onLatency(sum(latencies)/len(latencies))
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                self.onLatency(time.time()-last)
+            except Exception:
                 pass
+            duration = time.time()-start
+            if duration < ping_interval:
+                await asyncio.sleep(ping_interval - duration)
 
-            while True:
-                try:
-                    data = client.recv()
-                except Exception as e:
-                    print(e)
-                    pass
-                    
-                response = decrypt(scheme, data)
-                if response["type"] == "result":
-                    response["id"] = request_id
-                    images = []
-
-                    typ = {"PNG": "png", "JPEG": "jpg"}[response["data"]["type"]]
-                    for data in response["data"]["images"]:
-                        image = QImage()
-                        image.loadFromData(data, typ)
-                        images += [image]
-                    response["data"]["images"] = images
-
-                    callback(response)
-                    break
-            
-            client.close()
-            client.close_socket()
+    def getStats(self):
+        stats = super().getStats()
+        stats["transport"] = "async"
+        return stats
+
+    @pyqtSlot()
+    def stop(self):
+        super().stop()
+        try:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+        except Exception:
+            pass
+
+class PooledRemoteInference(QObject):
+    response = pyqtSignal(object)
+    GENERATION = {"txt2img", "img2img", "upscale", "annotate", "segmentation"}
+    MODELS = {"model", "UNET", "CLIP", "VAE"}
+    ALIVE = {"hello", "options", "ack", "result", "temporary"}
+    def __init__(self, gui, endpoints, asynchronous=False):
+        super().__init__()
+        self.gui = gui
+        self.members = []
+        for endpoint, password in endpoints:
+            if asynchronous:
+                inference = AsyncRemoteInference(gui, endpoint, password)
+            else:
+                inference = RemoteInference(gui, endpoint, password)
+            inference.response.connect(self.onMemberResponse)
+            self.members += [inference]
+
+        self.alive = [True] * len(self.members)
+        self.owners = {}
+        self.unacked = [0] * len(self.members)
+        self.backlog = [0] * len(self.members)
+        self.completed = [[] for _ in self.members]
+        self.options = {}
+        self.stopping = False
+
+    def start(self):
+        for inference in self.members:
+            inference.start()
+
+    def wait(self, timeout):
+        done = True
+        for inference in self.members:
+            done = inference.wait(timeout) and done
+        return done
+
+    def terminate(self):
+        for inference in self.members:
+            if inference.isRunning():
+                inference.terminate()
+
+    def primary(self):
+        for i in range(len(self.members)):
+            if self.alive[i]:
+                return i
+        return 0
+
+    def select(self, request):
+        alive = [i for i in range(len(self.members)) if self.alive[i]]
+        if not alive:
+            return 0
+        data = request.get("data", {})
+        names = {v for k, v in data.items() if k in self.MODELS and type(v) == str and v} if type(data) == dict else set()
+        if names:
+            alive = [i for i in alive if self.provides(i, names)] or alive
+        return min(alive, key=lambda i: (self.backlog[i] + self.unacked[i], i))
+
+    def provides(self, i, names):
+        available = set()
+        for value in self.options.get(i, {}).values():
+            if type(value) == list:
+                available.update(v for v in value if type(v) == str)
+        return names <= available
+
+    def mergedOptions(self):
+        merged = {}
+        primary = self.primary()
+        for i in sorted(self.options, key=lambda i: i != primary):
+            if not self.alive[i]:
+                continue
+            for k, v in self.options[i].items():
+                if type(v) == list and type(merged.get(k, None)) == list:
+                    merged[k] = merged[k] + [e for e in v if not e in merged[k]]
+                elif not k in merged:
+                    merged[k] = v
+        return merged
+
+    def complete(self, id):
+        if not id in self.owners:
+            return
+        i = self.owners[id]
+        del self.owners[id]
+        self.backlog[i] = max(0, self.backlog[i] - 1)
+
+    def throughput(self, i):
+        now = time.time()
+        self.completed[i] = [(t, n) for t, n in self.completed[i] if now - t < 60]
+        return sum([n for _, n in self.completed[i]])
+
+    def emitPool(self):
+        endpoints = []
+        for i, inference in enumerate(self.members):
+            endpoints += [{
+                "endpoint": inference.endpoint,
+                "alive": self.alive[i],
+                "queue": self.backlog[i] + self.unacked[i],
+                "rate": self.throughput(i)
+            }]
+        self.onResponse({"type": "remote_pool", "data": {"endpoints": endpoints}})
+
+    @pyqtSlot()
+    def stop(self):
+        self.stopping = True
+        for inference in self.members:
+            inference.stop()
+
+    @pyqtSlot(object)
+    def onRequest(self, request):
+        typ = request.get("type", "")
+        if typ == "cancel":
+            i = self.owners.get(request["data"]["id"], self.primary())
+        elif typ == "options":
+            for inference in self.members:
+                inference.onRequest(dict(request))
+            return
+        elif typ in self.GENERATION and "id" in request:
+            i = self.select(request)
+            self.owners[request["id"]] = i
+            self.unacked[i] += 1
+        elif typ == "upload":
+            i = self.select(request)
+        else:
+            i = self.primary()
+        self.members[i].onRequest(request)
+
+    @pyqtSlot(object)
+    def onMemberResponse(self, response):
+        if not self.sender() in self.members:
+            return
+        i = self.members.index(self.sender())
+        typ = response.get("type", "")
+        id = response.get("id", None)
+
+        if typ == "remote_error":
+            self.alive[i] = False
+            if not any(self.alive):
+                self.onResponse(response)
+                return
+            for owned in [k for k, v in self.owners.items() if v == i]:
+                del self.owners[owned]
+                self.onResponse({"type": "error", "id": owned, "data": {"message": f"{self.members[i].endpoint}: {response['data']['message']}"}})
+            self.emitPool()
+            if self.options.pop(i, None) != None:
+                self.onResponse({"type": "options", "data": self.mergedOptions()})
+            return
+
+        if typ in self.ALIVE and not self.alive[i]:
+            self.alive[i] = True
+            self.emitPool()
+
+        if typ == "options":
+            self.options[i] = response["data"]
+            self.onResponse({**response, "data": self.mergedOptions()})
+            return
+
+        if typ in {"status", "remote_latency"} and i != self.primary():
+            return
+
+        if typ == "ack" and response["data"].get("id", None) in self.owners:
+            self.unacked[i] = max(0, self.unacked[i] - 1)
+            self.backlog[i] = response["data"]["queue"] + 1
+            self.emitPool()
+
+        if typ == "result":
+            self.completed[i] += [(time.time(), len(response["data"]["images"]))]
+
+        if typ in {"result", "temporary", "error", "aborted"}:
+            self.complete(id)
+            self.emitPool()
+
+        self.onResponse(response)
+
+    def onResponse(self, response):
+        if not self.stopping:
+            self.response.emit(response)
 
-        thread = threading.Thread(target=do_fetch, args=([self.endpoint, self.password, result_id, request_id, self.onResponse]), daemon=True)
-        thread.start()
\ No newline at end of file
+    def getStats(self):
+        return {inference.endpoint: inference.getStats() for inference in self.members}
@@ -3,11 +3,59 @@ import sys
 from typing import *
 import time
 import threading
+import collections
+import queue
+import weakref
+import itertools
+import operator
+import re
 
 from PyQt5.QtCore import pyqtProperty, pyqtSlot, pyqtSignal, Qt, QObject, QThread, QAbstractListModel, QByteArray, QModelIndex, QTimer, QVariant
 from PyQt5.QtSql import QSqlDatabase, QSqlQuery, QSqlDriver
 from PyQt5.QtQml import qmlRegisterType
 
+QUERY_WORKERS = 2
+WRITE_BATCH = 512
+DELTA_LIMIT = 256
+DIFF_LIMIT = 64
+LOCK_RETRIES = 12
+LOCK_BACKOFF = 100
+
+DELTA_INSERT = 0
+DELTA_DELETE = 1
+DELTA_UPDATE = 2
+
+def execute(db, query, bindings=None, batch=False):
+    # shared cache table locks fail with SQLITE_LOCKED immediately instead of waiting on busy_timeout,
+    # DDL on the writer and page queries on the readers have to back off and retry around each other
+    delay = 1
+    for attempt in range(LOCK_RETRIES):
+        q = QSqlQuery(db)
+        if q.prepare(query):
+            if type(bindings) == dict:
+                for name, value in bindings.items():
+                    q.bindValue(name, value)
+            elif bindings:
+                for value in bindings:
+                    q.addBindValue(value)
+            if q.execBatch() if batch else q.exec():
+                return q
+        if q.lastError().nativeErrorCode() != "6":
+            return q
+        q.finish()
+        QThread.msleep(delay)
+        delay = min(delay * 2, LOCK_BACKOFF)
+    return q
+
+def runs(indices):
+    out = []
+    for i in indices:
+        if out and out[-1][1] == i:
+            out[-1][1] = i + 1
+        else:
+            out += [[i, i + 1]]
+    return out
+
 class NotificationDelay(QTimer):
     notification = pyqtSignal(str)
     def __init__(self, parent, table, interval=100):
@@ -23,6 +71,7 @@ class NotificationDelay(QTimer):
 
 class Database(QObject):
     notification = pyqtSignal(str)
+    delta = pyqtSignal(str, str, list, list, list)
     instance = None
     def __init__(self, parent):
         super().__init__(parent)
@@ -33,6 +82,15 @@ class Database(QObject):
         Database.instance = self
 
         self.timers = {}
+        self.models = weakref.WeakSet()
+        self.pool = QueryPool(self)
+
+        self.writer = DatabaseWriter()
+        self.writerThread = QThread()
+        self.writer.moveToThread(self.writerThread)
+        self.writer.delta.connect(self.onDelta)
+        self.writerThread.started.connect(self.writer.started)
+        self.writerThread.start()
 
     @pyqtSlot(str)
     def onNotification(self, table):
@@ -48,112 +106,357 @@ class Database(QObject):
     def onDelayNotification(self, table):
         self.notification.emit(table)
 
+    @pyqtSlot(str, str, list, list, list)
+    def onDelta(self, table, key, inserted, deleted, updated):
+        self.delta.emit(table, key, inserted, deleted, updated)
+        self.onNotification(table)
+
+    def stop(self):
+        self.pool.stop()
+        self.writer.flush.emit()
+        self.writerThread.quit()
+        self.writerThread.wait()
+
+    def stats(self):
+        models = {}
+        for model in list(self.models):
+            models[model.statsName()] = model.stats()
+        out = self.pool.stats()
+        out["writer"] = self.writer.stats()
+        out["models"] = models
+        return out
+
 class Connection(QObject):
     notification = pyqtSignal(str)
     def __init__(self, parent=None):
         super().__init__(parent)
         self.db = None
+        self.relaying = False
 
-    def connect(self):
-        name = f"db_{random.randint(0, 2**32)}"
+    def connect(self, name=None):
+        if not name:
+            name = f"db_{random.randint(0, 2**32)}"
         db = QSqlDatabase.cloneDatabase("database", name)
         db.open()
-        db.driver().notification[str].connect(Database.instance.onNotification)
-        Database.instance.notification.connect(self.relayNotification)
+        QSqlQuery(db).exec("PRAGMA read_uncommitted = 1;")
+
+        # the relay is queued to this object's thread, the writer and query workers never run an event loop for it
+        self.relaying = self.thread() == Database.instance.thread()
+        if self.relaying:
+            Database.instance.notification.connect(self.relayNotification)
 
         self.db = db
 
-    def enableNotifications(self, table):
-        if not table in self.db.driver().subscribedToNotifications():
-            self.db.driver().subscribeToNotification(table)
+    def enableNotifications(self, table, key="rowid"):
+        Database.instance.writer.submit(WriteJob(None, table=table, key=key, subscribe=True))
     
     def disableNotifications(self, table):
-        if table in self.db.driver().subscribedToNotifications():
-            self.db.driver().unsubscribeFromNotification(table)
-
-    def doQuery(self, q):
-        if type(q) == str:
-            query = QSqlQuery(self.db)
-            query.prepare(q)
-            q = query
-        
-        ctr = 0
-        while not q.exec():
-            if ctr > 100:
-                print(q.lastQuery(), q.boundValues(), "TIMEOUT")
-                break
-            if q.lastError().nativeErrorCode() == "6":
-                QThread.msleep(10)
-                ctr += 1
-                continue
-            else:
-                print(q.lastQuery(), q.boundValues(), q.lastError().text())
-                break
+        Database.instance.writer.submit(WriteJob(None, table=table, subscribe=False))
+
+    def write(self, query, bindings=None, wait=False):
+        job = WriteJob(query, bindings)
+        Database.instance.writer.submit(job)
+        if wait:
+            job.wait()
+        return job
+
+    def writeBatch(self, query, bindings, wait=False):
+        job = WriteJob(query, bindings, batch=True)
+        Database.instance.writer.submit(job)
+        if wait:
+            job.wait()
+        return job
+
+    def doQuery(self, query, bindings=None):
+        q = execute(self.db, query, bindings)
+        if q.lastError().isValid():
+            print(q.lastQuery(), q.boundValues(), q.lastError().text())
         return q
 
+    def close(self):
+        if self.relaying:
+            Database.instance.notification.disconnect(self.relayNotification)
+            self.relaying = False
+        if not self.db:
+            return
+        name = self.db.connectionName()
+        self.db.close()
+        self.db = None
+        QSqlDatabase.removeDatabase(name)
+
     @pyqtSlot(str)
     def relayNotification(self, table):
         self.notification.emit(table)
 
+class WriteJob():
+    def __init__(self, query, bindings=None, batch=False, table=None, key=None, subscribe=False):
+        self.query = query
+        self.bindings = bindings
+        self.batch = batch
+        self.table = table
+        self.key = key
+        self.subscribe = subscribe
+        self.errored = False
+        self.event = threading.Event()
+
+    def run(self, db):
+        q = execute(db, self.query, self.bindings, self.batch)
+        if q.lastError().isValid():
+            self.errored = True
+            print(q.lastQuery(), q.lastError().text())
+        q.finish()
+
+    def wait(self, timeout=None):
+        return self.event.wait(timeout)
+
+class DatabaseWriter(QObject):
+    pending = pyqtSignal()
+    flush = pyqtSignal()
+    delta = pyqtSignal(str, str, list, list, list)
+    def __init__(self):
+        super().__init__()
+        self.jobs = queue.Queue()
+        self.conn = None
+        self.keys = {}
+        self.transactions = 0
+        self.statements = 0
+        self.largest = 0
+        self.elapsed = 0
+        self.pending.connect(self.onPending)
+        self.flush.connect(self.onPending, Qt.BlockingQueuedConnection)
+
+    @pyqtSlot()
+    def started(self):
+        self.conn = Connection(self)
+        self.conn.connect("db_writer")
+        self.conn.doQuery("PRAGMA recursive_triggers = ON;")
+        self.conn.doQuery("CREATE TEMP TABLE deltas(tbl TEXT, op INTEGER, key);")
+
+    def submit(self, job):
+        self.jobs.put(job)
+        self.pending.emit()
+
+    @pyqtSlot()
+    def onPending(self):
+        while True:
+            batch = []
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch += [self.jobs.get_nowait()]
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self.apply(batch)
+
+    def apply(self, batch):
+        start = time.perf_counter()
+        db = self.conn.db
+        db.transaction()
+        for job in batch:
+            if job.table:
+                if job.subscribe:
+                    self.subscribe(job.table, job.key)
+                else:
+                    self.unsubscribe(job.table)
+                continue
+            job.run(db)
+            self.statements += 1
+        changes = self.collectDeltas()
+        db.commit()
+        for job in batch:
+            job.event.set()
+
+        for table, ops in changes.items():
+            inserted = [k for k, op in ops.items() if op == DELTA_INSERT]
+            deleted = [k for k, op in ops.items() if op == DELTA_DELETE]
+            updated = [k for k, op in ops.items() if op == DELTA_UPDATE]
+            self.delta.emit(table, self.keys.get(table, "rowid"), inserted, deleted, updated)
+
+        self.transactions += 1
+        self.largest = max(self.largest, len(batch))
+        self.elapsed += time.perf_counter() - start
+
+    def subscribe(self, table, key):
+        if self.keys.get(table) == key:
+            return
+        self.unsubscribe(table)
+        self.keys[table] = key
+        self.conn.doQuery(f"CREATE TEMP TRIGGER {table}_delta_insert AFTER INSERT ON main.{table} BEGIN INSERT INTO deltas VALUES ('{table}', {DELTA_INSERT}, new.{key}); END;")
+        self.conn.doQuery(f"CREATE TEMP TRIGGER {table}_delta_delete AFTER DELETE ON main.{table} BEGIN INSERT INTO deltas VALUES ('{table}', {DELTA_DELETE}, old.{key}); END;")
+        self.conn.doQuery(f"CREATE TEMP TRIGGER {table}_delta_update AFTER UPDATE ON main.{table} BEGIN INSERT INTO deltas SELECT '{table}', {DELTA_DELETE}, old.{key} WHERE old.{key} IS NOT new.{key}; INSERT INTO deltas VALUES ('{table}', {DELTA_UPDATE}, new.{key}); END;")
+
+    def unsubscribe(self, table):
+        if not table in self.keys:
+            return
+        del self.keys[table]
+        for op in ["insert", "delete", "update"]:
+            self.conn.doQuery(f"DROP TRIGGER IF EXISTS temp.{table}_delta_{op};")
+
+    def collectDeltas(self):
+        if not self.keys:
+            return {}
+        changes = {}
+        q = self.conn.doQuery("SELECT tbl, op, key FROM deltas ORDER BY rowid;")
+        while q.next():
+            ops = changes.setdefault(q.value(0), {})
+            op, key = q.value(1), q.value(2)
+            prev = ops.get(key, None)
+            if prev == DELTA_INSERT:
+                if op == DELTA_DELETE:
+                    del ops[key]
+                continue
+            if prev != None and op == DELTA_INSERT:
+                op = DELTA_UPDATE
+            ops[key] = op
+        q.finish()
+        if changes:
+            self.conn.doQuery("DELETE FROM deltas;")
+        return changes
+
+    def stats(self):
+        return {
+            "queued": self.jobs.qsize(),
+            "transactions": self.transactions,
+            "statements": self.statements,
+            "largest": self.largest,
+            "commit_ms": round(self.elapsed * 1000 / max(self.transactions, 1), 2)
+        }
+
 class QueryRunnableSignals(QObject):
     done = pyqtSignal(bool, str)
+    finished = pyqtSignal()
     def __init__(self):
         super().__init__()
     
-class QueryRunnable(QThread):
-    def __init__(self, query, partial):
-        super().__init__()
+class QueryRunnable():
+    def __init__(self, query, partial, bindings=[], page=-1, pageSize=0):
         self.query = query
+        self.bindings = bindings
         self.signals = QueryRunnableSignals()
         self.errored = None
         self.results = []
         self.partial = partial
         self.stopping = False
+        self.page = page
+        self.pageSize = pageSize
+        self.generation = 0
+        self.submitted = 0
+        self.started = 0
+        self.elapsed = 0
+        self.delivered = False
+        self.key = ""
 
     def runQuery(self, query, partial, limit=0):
-        q = self.conn.doQuery(query)
+        q = self.conn.doQuery(query, self.bindings)
         if self.stopping:
+            q.finish()
             return
 
         self.errored = q.lastError().isValid()
         if self.errored:
-            self.signals.done.emit()
+            self.signals.done.emit(False, self.query)
             return
         self.results = []
+        column = -1
         while q.next():
-            self.results += [q.record()]
+            if self.stopping:
+                break
+            record = q.record()
+            if self.key:
+                # pull the key here so the model's diff doesn't convert it on the GUI thread
+                if column == -1:
+                    column = record.indexOf(self.key)
+                if column != -1:
+                    record.rowKey = record.value(column)
+            self.results += [record]
         q.finish()
 
         if self.stopping:
             return
         
+        self.elapsed = time.perf_counter() - self.submitted
         self.signals.done.emit(partial and len(self.results) == limit, self.query)
 
-    def run(self):
-        self.conn = Connection()
-        self.conn.connect()
+    def run(self, conn):
+        self.conn = conn
+        self.started = time.perf_counter()
 
-        if self.partial:
+        if self.pageSize:
+            offset = self.page * self.pageSize
+            self.runQuery(self.query[:-1] + f" LIMIT {self.pageSize} OFFSET {offset};", False)
+        elif self.partial:
             limit = 64
             self.runQuery(self.query[:-1] + f" LIMIT {limit};", True, limit)
         else:
             self.runQuery(self.query, False)
 
+        self.conn = None
+
     def stop(self):
         self.stopping = True
 
+class QueryWorker(QThread):
+    def __init__(self, pool, index):
+        super().__init__()
+        self.pool = pool
+        self.name = f"db_reader_{index}"
+
+    def run(self):
+        conn = Connection()
+        conn.connect(self.name)
+        while True:
+            job = self.pool.jobs.get()
+            if job == None:
+                break
+            if job.stopping:
+                self.pool.dropped += 1
+            else:
+                job.run(conn)
+                self.pool.completed += 1
+            job.signals.finished.emit()
+        conn.close()
+
+class QueryPool(QObject):
+    def __init__(self, parent, size=QUERY_WORKERS):
+        super().__init__(parent)
+        self.jobs = queue.Queue()
+        self.dropped = 0
+        self.completed = 0
+        self.workers = [QueryWorker(self, i) for i in range(size)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, job):
+        job.submitted = time.perf_counter()
+        self.jobs.put(job)
+
+    def stop(self):
+        for worker in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.wait()
+
+    def stats(self):
+        return {
+            "workers": len(self.workers),
+            "queued": self.jobs.qsize(),
+            "completed": self.completed,
+            "dropped": self.dropped
+        }
+
 class Sql(QAbstractListModel):
     queryChanged = pyqtSignal()
     resultsChanged = pyqtSignal()
     partialChanged = pyqtSignal()
+    keysRemoved = pyqtSignal(list)
     def __init__(self, parent):
         super().__init__(parent)
 
         self.results = []
 
-        self.conn = Connection(self)
-        self.conn.connect()
-        self.conn.notification.connect(self.onNotification)
+        Database.instance.delta.connect(self.onDelta)
+        Database.instance.models.add(self)
 
         self.errored = False
         self.currentQuery = ""
@@ -164,9 +467,43 @@ class Sql(QAbstractListModel):
         self.reloadTimer.timeout.connect(self.reload)
 
         self.runnable = None
+        self.outstanding = 0
+        self.queries = 0
+        self.superseded = 0
+        self.latency = 0
+
+        self.deltaRunnable = None
+        self.deltaKeys = set()
+        self.deltaInserted = set()
+        self.deltaDeleted = set()
+        self.deltas = 0
+        self.reloads = 0
+
+        self._bindings = []
+        self._bound = False
+        self.pendingQuery = None
+        self.pendingBindings = False
+        self.applyTimer = QTimer(self)
+        self.applyTimer.setSingleShot(True)
+        self.applyTimer.setInterval(0)
+        self.applyTimer.timeout.connect(self.applyPending)
 
         self._partial = False 
         self._debug = False
+        self._key = ""
+
+        self._pageSize = 0
+        self._window = 4096
+        self._total = 0
+        self.pages = collections.OrderedDict()
+        self.pageQueue = []
+        self.pageRunnable = None
+        self.countRunnable = None
+        self._countQuery = ""
+        self.generation = 0
+        self.rows = 0
+        self.exhausted = False
+        self.reloading = False
 
     @pyqtProperty(bool, notify=queryChanged)
     def debug(self):
@@ -176,18 +513,81 @@ class Sql(QAbstractListModel):
     def debug(self, value):
         self._debug = value
         
+    @pyqtProperty(str, notify=queryChanged)
+    def key(self):
+        return self._key
+
+    @key.setter
+    def key(self, value):
+        self._key = value
+
+    @pyqtProperty(int, notify=queryChanged)
+    def pageSize(self):
+        return self._pageSize
+
+    @pageSize.setter
+    def pageSize(self, value):
+        self._pageSize = value
+
+    @pyqtProperty(str, notify=queryChanged)
+    def countQuery(self):
+        return self._countQuery
+
+    @countQuery.setter
+    def countQuery(self, value):
+        self._countQuery = value
+
+    @pyqtProperty(int, notify=queryChanged)
+    def window(self):
+        return self._window
+
+    @window.setter
+    def window(self, value):
+        self._window = value
+
     @pyqtProperty(str, notify=queryChanged)
     def query(self):
         return self.currentQuery
 
     @query.setter
     def query(self, value):
+        if self._bound:
+            self.pendingQuery = value
+            self.applyTimer.start()
+            return
         if value == self.currentQuery:
             return
         self.setQuery(value)
 
-    def setQuery(self, value):
-        different = (value != self.currentQuery)
+    @pyqtProperty('QVariantList', notify=queryChanged)
+    def bindings(self):
+        return self._bindings
+
+    @bindings.setter
+    def bindings(self, value):
+        self._bound = True
+        if value == self._bindings:
+            return
+        self._bindings = value
+        if self.pendingQuery == None:
+            self.pendingQuery = self.currentQuery
+        self.pendingBindings = True
+        self.applyTimer.start()
+
+    @pyqtSlot()
+    def applyPending(self):
+        value = self.pendingQuery
+        self.pendingQuery = None
+        if value == None:
+            return
+        different = value != self.currentQuery or self.pendingBindings
+        self.pendingBindings = False
+        if different:
+            self.setQuery(value, True)
+
+    def setQuery(self, value, different=None):
+        if different == None:
+            different = (value != self.currentQuery)
         if different:
             self.queryChanged.emit()
 
@@ -199,20 +599,55 @@ class Sql(QAbstractListModel):
         if self._debug:
             print("RUN")
 
+        if self._pageSize:
+            self.loadPages(different)
+            return
+
         self.runQuery(self.currentQuery, different)
 
     def runQuery(self, query, partial):
-        if self.runnable:
+        self.dropDelta()
+        if self.runnable and not self.runnable.delivered:
             self.runnable.stop()
-            self.runnable.wait()
-        self.runnable = QueryRunnable(query, partial)
+            self.superseded += 1
+        self.runnable = QueryRunnable(query, partial, list(self._bindings))
+        self.runnable.key = self._key
         self.runnable.signals.done.connect(self.onDone)
-        self.runnable.start()
+        self.submit(self.runnable)
+
+    def submit(self, runnable):
+        runnable.signals.finished.connect(self.onFinished)
+        self.outstanding += 1
+        Database.instance.pool.submit(runnable)
+
+    @pyqtSlot()
+    def onFinished(self):
+        self.outstanding -= 1
+
+    def measure(self, runnable):
+        self.queries += 1
+        ms = runnable.elapsed * 1000
+        self.latency = ms if self.queries == 1 else self.latency * 0.8 + ms * 0.2
+
+    def statsName(self):
+        return self.objectName() or self.currentQuery[:48]
+
+    def stats(self):
+        return {
+            "queued": self.outstanding,
+            "queries": self.queries,
+            "superseded": self.superseded,
+            "latency_ms": round(self.latency, 2),
+            "deltas": self.deltas,
+            "reloads": self.reloads
+        }
 
     @pyqtSlot(bool, str)
     def onDone(self, partial, query):
-        if query != self.currentQuery:
+        if query != self.currentQuery or self.sender() != self.runnable.signals:
             return
+        self.runnable.delivered = True
+        self.measure(self.runnable)
 
         self.errored = self.runnable.errored
         if self.errored:
@@ -233,6 +668,181 @@ class Sql(QAbstractListModel):
         if partial:
             self.runQuery(self.currentQuery, False)
     
+    def loadPages(self, different):
+        self.generation += 1
+        if different:
+            self.reset()
+            self._partial = True
+            self.partialChanged.emit()
+        self.reloading = self.rows > 0
+        self.pageQueue = []
+        self.dropDelta()
+        if self.pageRunnable:
+            self.pageRunnable.stop()
+            self.pageRunnable = None
+            self.superseded += 1
+        if self.countRunnable:
+            self.countRunnable.stop()
+            self.countRunnable = None
+        self.requestPage(0)
+
+    def requestPage(self, page):
+        if page in self.pageQueue:
+            self.pageQueue.remove(page)
+        elif self.pageRunnable and self.pageRunnable.page == page and self.pageRunnable.generation == self.generation:
+            return
+        self.pageQueue.insert(0, page)
+        del self.pageQueue[max(1, self._window // self._pageSize):]
+        self.runPage()
+
+    def runPage(self):
+        if self.pageRunnable or not self.pageQueue or not self.currentQuery:
+            return
+        page = self.pageQueue.pop(0)
+        self.pageRunnable = QueryRunnable(self.currentQuery, False, list(self._bindings), page, self._pageSize)
+        self.pageRunnable.generation = self.generation
+        self.pageRunnable.key = self._key
+        self.pageRunnable.signals.done.connect(self.onPageDone)
+        self.submit(self.pageRunnable)
+
+    @pyqtSlot(bool, str)
+    def onPageDone(self, partial, query):
+        runnable = self.pageRunnable
+        if not runnable or self.sender() != runnable.signals:
+            return
+        self.pageRunnable = None
+        self.measure(runnable)
+
+        if runnable.generation == self.generation:
+            self.errored = runnable.errored
+            if self.errored:
+                self.reset()
+                return
+            self.applyPage(runnable.page, runnable.results)
+            if runnable.page == 0:
+                self.runCount()
+
+        self.runPage()
+
+    def runCount(self):
+        # counting walks every match, keep it off the first page's path
+        if self.countRunnable:
+            self.countRunnable.stop()
+        query = self._countQuery or f"SELECT COUNT(*) FROM ({self.currentQuery.strip()[:-1]});"
+        self.countRunnable = QueryRunnable(query, False, list(self._bindings))
+        self.countRunnable.generation = self.generation
+        self.countRunnable.signals.done.connect(self.onCountDone)
+        self.submit(self.countRunnable)
+
+    @pyqtSlot(bool, str)
+    def onCountDone(self, partial, query):
+        runnable = self.countRunnable
+        if not runnable or self.sender() != runnable.signals:
+            return
+        self.countRunnable = None
+        if runnable.generation != self.generation or runnable.errored or not runnable.results:
+            return
+        self._total = runnable.results[0].value(0)
+        if self.rows > self._total:
+            self.beginRemoveRows(QModelIndex(), self._total, self.rows-1)
+            self.rows = self._total
+            self.endRemoveRows()
+        if self.rows == self._total:
+            self.exhausted = True
+        self.resultsChanged.emit()
+
+    def pageShift(self, records):
+        if not records or not 0 in self.pages or not self.pages[0]:
+            return 0
+        first = self.pages[0][0]
+        column = first.indexOf(self._key) if self._key else -1
+        for i, record in enumerate(records):
+            if (record.value(column) == first.value(column)) if column != -1 else (record == first):
+                return i
+        return 0
+
+    def applyPage(self, page, records):
+        if records:
+            self.updateFieldNames(records[0])
+
+        reloaded = page == 0 and self.reloading
+        if reloaded:
+            self.reloading = False
+            shift = self.pageShift(records)
+            self.pages.clear()
+            self.pages[0] = records
+            if shift:
+                self.beginInsertRows(QModelIndex(), 0, shift-1)
+                self.rows += shift
+                self.endInsertRows()
+        else:
+            self.pages[page] = records
+        self.pages.move_to_end(page)
+
+        start = page * self._pageSize
+        end = start + len(records)
+
+        limit = self.rows
+        if len(records) < self._pageSize:
+            self.exhausted = True
+            limit = end
+        if limit < self.rows:
+            self.beginRemoveRows(QModelIndex(), limit, self.rows-1)
+            self.rows = limit
+            self.endRemoveRows()
+
+        if self.rows > start:
+            self.dataChanged.emit(self.index(start), self.index(min(end, self.rows)-1))
+        if reloaded and self.rows > end:
+            self.dataChanged.emit(self.index(end), self.index(self.rows-1))
+
+        if end > self.rows:
+            self.beginInsertRows(QModelIndex(), self.rows, end-1)
+            self.rows = end
+            self.endInsertRows()
+
+        for stale in list(self.pages):
+            if len(self.pages) * self._pageSize <= self._window or len(self.pages) <= 2:
+                break
+            if stale != 0 and stale != page:
+                del self.pages[stale]
+
+        if page == 0 and self._partial:
+            self._partial = False
+            self.partialChanged.emit()
+
+        self.resultsChanged.emit()
+
+    def canFetchMore(self, parent):
+        return bool(self._pageSize and self.currentQuery and not self.exhausted)
+
+    def fetchMore(self, parent):
+        if self.canFetchMore(parent):
+            self.requestPage(self.rows // self._pageSize)
+
+    def record(self, row):
+        if not self._pageSize:
+            return self.results[row] if 0 <= row < len(self.results) else None
+        if row < 0 or row >= self.rows:
+            return None
+        page = row // self._pageSize
+        records = self.pages.get(page)
+        if records == None:
+            self.requestPage(page)
+            return None
+        self.pages.move_to_end(page)
+        offset = row - page * self._pageSize
+        return records[offset] if offset < len(records) else None
+
+    def resident(self, row):
+        if not self._pageSize:
+            return self.results[row] if 0 <= row < len(self.results) else None
+        if row < 0 or row >= self.rows:
+            return None
+        records = self.pages.get(row // self._pageSize)
+        offset = row % self._pageSize
+        return records[offset] if records and offset < len(records) else None
+
     def updateResults(self, newResults):
         def find(a, b):
             for i, e in enumerate(a):
@@ -259,6 +869,9 @@ class Sql(QAbstractListModel):
             self.resultsChanged.emit()
             return
 
+        if self._key and self.updateKeyedResults(newResults):
+            return
+
         totalResults = len(newResults)
 
         changed = False
@@ -307,33 +920,139 @@ class Sql(QAbstractListModel):
         if changed:
             self.resultsChanged.emit()
 
+    def recordKeys(self, records, column):
+        try:
+            return [r.rowKey for r in records]
+        except AttributeError:
+            pass
+        for r in records:
+            if not hasattr(r, "rowKey"):
+                r.rowKey = r.value(column)
+        return [r.rowKey for r in records]
+
+    def updateKeyedResults(self, newResults):
+        oldColumn = self.results[0].indexOf(self._key)
+        newColumn = newResults[0].indexOf(self._key)
+        if oldColumn == -1 or newColumn == -1:
+            return False
+
+        # only the rows between the common prefix and suffix need to be diffed
+        def common(a, b):
+            return sum(1 for _ in itertools.takewhile(bool, map(operator.eq, a, b)))
+
+        n = min(len(self.results), len(newResults))
+        first = common(self.results, newResults)
+        last = min(n - first, common(reversed(self.results), reversed(newResults)))
+        if first == n and len(self.results) == len(newResults):
+            return True
+
+        oldKeys = self.recordKeys(self.results[first:len(self.results)-last], oldColumn)
+        newKeys = self.recordKeys(newResults[first:len(newResults)-last], newColumn)
+
+        removed, inserted = [], []
+        if oldKeys != newKeys:
+            oldSet = set(oldKeys)
+            newSet = set(newKeys)
+            if len(newSet) != len(newKeys) or len(oldSet) != len(oldKeys):
+                return False
+
+            removed = runs(i for i, k in enumerate(oldKeys) if not k in newSet)
+            inserted = runs(j for j, k in enumerate(newKeys) if not k in oldSet)
+            if len(removed) + len(inserted) > DIFF_LIMIT:
+                self.beginResetModel()
+                self.results = list(newResults)
+                self.endResetModel()
+                self.resultsChanged.emit()
+                return True
+
+        changed = bool(removed or inserted)
+
+        for a, b in reversed(removed):
+            self.beginRemoveRows(QModelIndex(), first+a, first+b-1)
+            del self.results[first+a:first+b]
+            self.endRemoveRows()
+
+        for a, b in inserted:
+            self.beginInsertRows(QModelIndex(), first+a, first+b-1)
+            self.results[first+a:first+a] = newResults[first+a:first+b]
+            self.endInsertRows()
+
+        current = [k for k in oldKeys if k in newSet] if removed else oldKeys
+        if inserted:
+            kept = iter(current)
+            current = [k if not k in oldSet else next(kept) for k in newKeys]
+
+        misplaced = [] if current == newKeys else [j for j in range(len(newKeys)) if current[j] != newKeys[j]]
+        if len(misplaced) > DIFF_LIMIT:
+            self.layoutAboutToBeChanged.emit()
+            self.results = list(newResults)
+            self.layoutChanged.emit()
+            self.resultsChanged.emit()
+            return True
+
+        if misplaced:
+            for i in range(misplaced[0], len(newKeys)):
+                if current[i] == newKeys[i]:
+                    continue
+                p = current.index(newKeys[i], i+1)
+                self.beginMoveRows(QModelIndex(), first+p, first+p, QModelIndex(), first+i)
+                self.results.insert(first+i, self.results.pop(first+p))
+                current.insert(i, current.pop(p))
+                self.endMoveRows()
+                changed = True
+
+        end = first + len(newKeys)
+        different = [i for i, same in enumerate(map(operator.eq, self.results[first:end], newResults[first:end]), first) if not same]
+        for a, b in runs(different):
+            self.results[a:b] = newResults[a:b]
+            self.dataChanged.emit(self.index(a), self.index(b-1))
+            changed = True
+
+        if changed:
+            self.resultsChanged.emit()
+        return True
+
     def data(self, index, role):
         value = QVariant()
-        if role > Qt.UserRole:
-            column = role - Qt.UserRole - 1
-            row = index.row()
-            if row < len(self.results):
-                value = self.results[row].value(column)
-        elif role == Qt.UserRole:
-            row = index.row()
-            if row < len(self.results):
-                value = self.results[row].value(0)
+        if role >= Qt.UserRole:
+            record = self.record(index.row())
+            if record != None:
+                value = record.value(max(role - Qt.UserRole - 1, 0))
         return value
 
     @pyqtSlot(int, result='QVariant')
     def get(self, index):
-        if len(self.results) <= index:
+        record = self.record(index)
+        if record == None:
             return None
 
         out = {}
-        record = self.results[index]
         for i in range(len(record)):
             out[record.fieldName(i)] = record.value(i)
         return out
+
+    @pyqtSlot('QVariant', result=int)
+    def indexOf(self, value):
+        if self._pageSize:
+            pages = [(p * self._pageSize, r) for p, r in self.pages.items()]
+        else:
+            pages = [(0, self.results)]
+        for start, records in pages:
+            if not records:
+                continue
+            column = max(records[0].indexOf(self._key), 0) if self._key else 0
+            for i, record in enumerate(records):
+                if record.value(column) == value:
+                    return start + i
+        return -1
     
     @pyqtProperty(int, notify=resultsChanged)
     def length(self):
-        return len(self.results)
+        return self.rows if self._pageSize else len(self.results)
+
+    @pyqtProperty(int, notify=resultsChanged)
+    def total(self):
+        return max(self._total, self.rows) if self._pageSize else len(self.results)
 
     def updateFieldNames(self, record):
         self.fieldNames = {}
@@ -345,12 +1064,18 @@ class Sql(QAbstractListModel):
         return self.fieldNames
 
     def rowCount(self, parent):
-        return len(self.results)
+        return self.length
 
     def reset(self):
         self.beginResetModel()
         self.fieldNames = {}
         self.results = []
+        self.pages.clear()
+        self.rows = 0
+        self._total = 0
+        self.exhausted = False
+        self.reloading = False
+        self.generation += 1
         self.endResetModel()
 
     @pyqtSlot()
@@ -358,11 +1083,237 @@ class Sql(QAbstractListModel):
         self.beginResetModel()
         self.endResetModel()
 
-    @pyqtSlot(str)
-    def onNotification(self, table):
-        if table in self.currentQuery:
-            if not self.reloadTimer.isActive():
-                self.reloadTimer.start(random.randint(50,150))
+    def scheduleReload(self):
+        self.dropDelta()
+        if not self.reloadTimer.isActive():
+            self.reloads += 1
+            self.reloadTimer.start(random.randint(50,150))
+
+    @pyqtSlot(str, str, list, list, list)
+    def onDelta(self, table, key, inserted, deleted, updated):
+        if not self.currentQuery or not table in self.currentQuery:
+            return
+
+        if deleted and key == self._key:
+            self.keysRemoved.emit(deleted)
+
+        changed = inserted + updated
+        if self.reloadTimer.isActive():
+            return
+        if key != self._key or (self.runnable and not self.runnable.delivered):
+            self.scheduleReload()
+            return
+        if len(self.deltaKeys) + len(changed) > DELTA_LIMIT or (changed and not self.deltaOrder()):
+            self.scheduleReload()
+            return
+
+        self.deltaKeys.update(changed)
+        self.deltaInserted.update(inserted)
+        self.deltaDeleted.update(deleted)
+        if not self.deltaRunnable:
+            self.runDelta()
+
+    def deltaOrder(self):
+        query = self.currentQuery.strip()
+        if not query.startswith("SELECT ") or query.startswith("SELECT DISTINCT ") or not query.endswith(";"):
+            return None
+        if not " ORDER BY " in query or not " FROM " in query:
+            return None
+        head, order = query[:-1].rsplit(" ORDER BY ", 1)
+        columns, tables = head[7:].split(" FROM ", 1)
+        if "(" in columns or " LIMIT " in order or ")" in order:
+            return None
+        terms = []
+        for term in order.split(","):
+            match = re.fullmatch(r"([\w.]+)(?: (ASC|DESC))?", term.strip(), re.IGNORECASE)
+            if not match:
+                return None
+            terms += [(match.group(1), (match.group(2) or "").upper() == "DESC")]
+        return columns, tables, terms
+
+    def deltaQuery(self, count):
+        # only the changed rows are fetched, each placed by counting the rows that sort before it
+        columns, tables, terms = self.deltaOrder()
+        sorts = ", ".join(f"{column} AS sql_sort_{i}" for i, (column, _) in enumerate(terms))
+        inner = f"SELECT {columns}, {sorts} FROM {tables}"
+        before = []
+        for i, (_, descending) in enumerate(terms):
+            equal = [f"b.sql_sort_{j} = r.sql_sort_{j}" for j in range(i)]
+            before += ["(" + " AND ".join(equal + [f"b.sql_sort_{i} {'>' if descending else '<'} r.sql_sort_{i}"]) + ")"]
+        marks = ", ".join(["?"] * count)
+        return f"SELECT (SELECT COUNT(*) FROM ({inner}) AS b WHERE {' OR '.join(before)}) AS sql_position, r.* FROM ({inner}) AS r WHERE r.{self._key} IN ({marks});", len(terms)
+
+    def runDelta(self):
+        keys = list(self.deltaKeys)
+        inserted = self.deltaInserted & self.deltaKeys
+        deleted = list(self.deltaDeleted)
+        self.deltaKeys = set()
+        self.deltaInserted = set()
+        self.deltaDeleted = set()
+
+        if not keys:
+            self.applyDelta(deleted, [], inserted, [])
+            return
+
+        query, sorts = self.deltaQuery(len(keys))
+        self.deltaRunnable = QueryRunnable(query, False, list(self._bindings) * 2 + keys)
+        self.deltaRunnable.key = self._key
+        self.deltaRunnable.sorts = sorts
+        self.deltaRunnable.changed = keys
+        self.deltaRunnable.inserted = inserted
+        self.deltaRunnable.deleted = deleted
+        self.deltaRunnable.signals.done.connect(self.onDeltaDone)
+        self.submit(self.deltaRunnable)
+
+    def dropDelta(self):
+        if self.deltaRunnable:
+            self.deltaRunnable.stop()
+            self.deltaRunnable = None
+        self.deltaKeys = set()
+        self.deltaInserted = set()
+        self.deltaDeleted = set()
+
+    @pyqtSlot(bool, str)
+    def onDeltaDone(self, partial, query):
+        runnable = self.deltaRunnable
+        if not runnable or self.sender() != runnable.signals:
+            return
+        self.deltaRunnable = None
+        self.measure(runnable)
+
+        if runnable.errored:
+            self.scheduleReload()
+            return
+
+        if self.deltaKeys or self.deltaDeleted:
+            # the query may already see the newer changes, placing against them would misorder rows
+            self.deltaKeys.update(runnable.changed)
+            self.deltaInserted.update(runnable.inserted)
+            self.deltaDeleted.update(runnable.deleted)
+            if len(self.deltaKeys) > DELTA_LIMIT:
+                self.scheduleReload()
+            else:
+                self.runDelta()
+            return
+
+        found = []
+        for record in runnable.results:
+            position = record.value(0)
+            record.remove(0)
+            for _ in range(runnable.sorts):
+                last = record.count() - 1
+                if record.isNull(last):
+                    # NULLs sort first but never compare, the counted position would be wrong
+                    self.scheduleReload()
+                    return
+                record.remove(last)
+            found += [(position, record)]
+        self.applyDelta(runnable.deleted, runnable.changed, runnable.inserted, found)
+
+    def applyDelta(self, deleted, changed, inserted, found):
+        found.sort(key=lambda f: f[0])
+        self.deltas += 1
+
+        if self._pageSize:
+            self.applyPagedDelta(deleted, changed, inserted, found)
+            return
+
+        sample = self.results[0] if self.results else (found[0][1] if found else None)
+        if sample == None:
+            return
+        column = sample.indexOf(self._key)
+        if column == -1:
+            self.scheduleReload()
+            return
+
+        gone = set(deleted) | set(changed)
+        rows = [r for r, k in zip(self.results, self.recordKeys(self.results, column)) if not k in gone]
+        for position, record in found:
+            if position > len(rows):
+                self.scheduleReload()
+                return
+            rows.insert(position, record)
+
+        self.updateResults(rows)
+
+    def applyPagedDelta(self, deleted, changed, inserted, found):
+        size = self._pageSize
+        sample = next((r[0] for r in self.pages.values() if r), found[0][1] if found else None)
+        if sample == None:
+            return
+        column = sample.indexOf(self._key)
+        if column == -1:
+            self.scheduleReload()
+            return
+
+        resident = {}
+        for page, records in self.pages.items():
+            for i, key in enumerate(self.recordKeys(records, column)):
+                resident[key] = page * size + i
+
+        # a key that isn't resident could still have been in the results, unless every row is loaded
+        complete = self.exhausted and all(p in self.pages for p in range((self.rows + size - 1) // size))
+        for key in itertools.chain(deleted, changed):
+            if not key in resident and not key in inserted and not complete:
+                self.scheduleReload()
+                return
+
+        removed = sorted(resident[k] for k in set(deleted) | set(changed) if k in resident)
+        moved = [(p, r) for p, r in found if resident.get(r.rowKey, -1) != p]
+        if not moved and len(removed) == len(found):
+            for position, record in found:
+                page, i = divmod(position, size)
+                self.pages[page][i] = record
+                self.dataChanged.emit(self.index(position), self.index(position))
+            if found:
+                self.resultsChanged.emit()
+            return
+
+        # lay the resident pages out flat, holes are rows that were never loaded
+        flat = [None] * self.rows
+        for page, records in self.pages.items():
+            flat[page * size:page * size + len(records)] = records[:max(0, self.rows - page * size)]
+
+        for a, b in reversed(runs(removed)):
+            self.beginRemoveRows(QModelIndex(), a, b-1)
+            del flat[a:b]
+            self.endRemoveRows()
+
+        for a, b in runs(p for p, _ in found):
+            if a > len(flat) or (a == len(flat) and not self.exhausted):
+                # past the loaded rows, the page brings it in when it's fetched
+                break
+            self.beginInsertRows(QModelIndex(), a, b-1)
+            flat[a:a] = [r for p, r in found if a <= p < b]
+            self.endInsertRows()
+
+        # pages keep the rows still known from their start, a page cut short is fetched again
+        order = list(self.pages)
+        self.pages.clear()
+        stale = []
+        for page in order:
+            records = flat[page * size:(page + 1) * size]
+            if None in records:
+                records = records[:records.index(None)]
+            if not records:
+                continue
+            self.pages[page] = records
+            if len(records) < size and (page + 1) * size < len(flat):
+                stale += [page]
+        self.rows = len(flat)
+
+        if self._total:
+            self._total += len(found) - len(removed)
+        if self.countRunnable:
+            self.runCount()
+        if self.pageRunnable:
+            # it may have read the table before this change, ask again once it lands
+            self.pageRunnable.generation = -1
+            if not self.pageRunnable.page in self.pageQueue:
+                self.pageQueue.insert(0, self.pageRunnable.page)
+        for page in reversed(stale):
+            self.requestPage(page)
+        self.resultsChanged.emit()
 
     @pyqtSlot()
     def reload(self):
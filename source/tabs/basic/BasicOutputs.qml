@@ -28,6 +28,7 @@ Item {
         model: Sql {
             id: outputsSql
             query: "SELECT id FROM outputs ORDER BY id DESC;"
+            key: "id"
         }
         ScrollBar.horizontal: SScrollBarH { 
             id: scrollBar
@@ -2,7 +2,6 @@ from PyQt5.QtCore import pyqtProperty, pyqtSlot, pyqtSignal, QObject, QSize, QUr
 from PyQt5.QtQml import qmlRegisterSingletonType, qmlRegisterUncreatableType
 from PyQt5.QtGui import QImage, QDrag, QCursor
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtSql import QSqlQuery
 from PyQt5.QtNetwork import QNetworkRequest, QNetworkReply
 
 import parameters
@@ -67,9 +66,8 @@ class Basic(QObject):
         self.gui.network.finished.connect(self.onNetworkReply)
 
         self.conn = sql.Connection(self)
-        self.conn.connect()
-        self.conn.doQuery("CREATE TABLE outputs(id INTEGER);")
-        self.conn.enableNotifications("outputs")
+        self.conn.write("CREATE TABLE outputs(id INTEGER);", wait=True)
+        self.conn.enableNotifications("outputs", "id")
 
         self._manager.result.connect(self.onResult)
         self._manager.artifact.connect(self.onArtifact)
@@ -110,10 +108,7 @@ class Basic(QObject):
 
     def createOutput(self, id, image):
         self._outputs[id] = BasicOutput(self, image)
-        q = QSqlQuery(self.conn.db)
-        q.prepare("INSERT INTO outputs(id) VALUES (:id);")
-        q.bindValue(":id", id)
-        self.conn.doQuery(q)
+        self.conn.write("INSERT INTO outputs(id) VALUES (:id);", {":id": id})
 
     @pyqtSlot(int, QImage, object, str)
     def onResult(self, id, image, metadata, filename):
@@ -378,10 +373,7 @@ class Basic(QObject):
             return
         self._outputs[id].deleteLater()
         del self._outputs[id]
-        q = QSqlQuery(self.conn.db)
-        q.prepare("DELETE FROM outputs WHERE id = :id;")
-        q.bindValue(":id", id)
-        self.conn.doQuery(q)
+        self.conn.write("DELETE FROM outputs WHERE id = :id;", {":id": id})
    
     @pyqtSlot(int)
     def deleteOutputAfter(self, id):
@@ -389,10 +381,7 @@ class Basic(QObject):
             if i < id:
                 self._outputs[i].deleteLater()
                 del self._outputs[i]
-        q = QSqlQuery(self.conn.db)
-        q.prepare("DELETE FROM outputs WHERE id < :idx;")
-        q.bindValue(":idx", id)
-        self.conn.doQuery(q)
+        self.conn.write("DELETE FROM outputs WHERE id < :idx;", {":idx": id})
 
     @pyqtProperty(int, notify=openedUpdated)
     def openedIndex(self):
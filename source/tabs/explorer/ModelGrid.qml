@@ -79,6 +79,7 @@ Item {
         model: Sql {
             id: modelsSql
             query: "SELECT name, category, display, type, desc, file, width, height FROM models WHERE " + root.query + " AND name LIKE '%" + root.search + "%' ORDER BY idx ASC;"
+            key: "file"
             property bool reset: false
             debug: false
             function refresh() {
@@ -106,6 +107,39 @@ Item {
             increment: 0.25/Math.ceil(modelsView.count / Math.round(modelsView.width/modelsView.cellWidth))
         }
 
+        property real prefetchY: 0
+        property real prefetchTime: 0
+
+        function prefetch() {
+            var now = Date.now()
+            var dt = (now - modelsView.prefetchTime) / 1000
+            var velocity = dt > 0 && dt < 1 ? (modelsView.contentY - modelsView.prefetchY) / (modelsView.cellHeight * dt) : 0
+            modelsView.prefetchY = modelsView.contentY
+            modelsView.prefetchTime = now
+            var columns = Math.max(Math.round(modelsView.width/modelsView.cellWidth), 1)
+            var first = Math.max(Math.floor(modelsView.contentY/modelsView.cellHeight), 0) * columns
+            var last = Math.ceil((modelsView.contentY + modelsView.height)/modelsView.cellHeight) * columns - 1
+            GUI.prefetchThumbnails(modelsView.model, first, last, columns, velocity)
+        }
+
+        onContentYChanged: {
+            if(!prefetchTimer.running) {
+                prefetchTimer.start()
+            }
+        }
+
+        onCountChanged: {
+            prefetchTimer.restart()
+        }
+
+        Timer {
+            id: prefetchTimer
+            interval: 100
+            onTriggered: {
+                modelsView.prefetch()
+            }
+        }
+
         delegate: ModelCard {
             grid: root
             onChanged: {
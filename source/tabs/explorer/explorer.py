@@ -1,6 +1,5 @@
 from PyQt5.QtCore import Qt, pyqtProperty, pyqtSignal, QObject, pyqtSlot, QUrl, QThread, QMimeData, QByteArray
 from PyQt5.QtQml import qmlRegisterSingletonType
-from PyQt5.QtSql import QSqlQuery
 from PyQt5.QtGui import QImage, QDesktopServices, QDrag
 
 import sql
@@ -55,8 +54,7 @@ class Populater(QObject):
         self.populateCache()
 
         self.conn = sql.Connection(self)
-        self.conn.connect()
-        self.conn.enableNotifications("models")
+        self.conn.enableNotifications("models", "file")
 
         self.optionsUpdated()
         self.favouritesUpdated()
@@ -71,16 +69,13 @@ class Populater(QObject):
         self.populateCache()
         
         self.conn = sql.Connection(self)
-        self.conn.connect()
-        self.conn.enableNotifications("models")
+        self.conn.enableNotifications("models", "file")
 
         self.favouritesUpdated()
         
         self.gui.setTabWorking(self.name, False)
     
     def setModel(self, name, category, display, type, idx, allow_folder = True):
-        q = QSqlQuery(self.conn.db)
-
         folder = ""
         parts = name.split(os.path.sep)
         if len(parts) > 2 and allow_folder:
@@ -146,25 +141,13 @@ class Populater(QObject):
                 continue
             break
         
-        q.prepare("INSERT OR REPLACE INTO models(name, category, display, type, file, folder, desc, idx, width, height) VALUES (:name, :category, :display, :type, :file, :folder, :desc, :idx, :width, :height);")
-        q.bindValue(":name", name)
-        q.bindValue(":category", category)
-        q.bindValue(":display", display)
-        q.bindValue(":type", type)
-        q.bindValue(":file", preview)
-        q.bindValue(":folder", folder)
-        q.bindValue(":desc", description)
-        q.bindValue(":idx", idx)
-        q.bindValue(":width", w)
-        q.bindValue(":height", h)
-        self.conn.doQuery(q)
+        self.conn.write("INSERT OR REPLACE INTO models(name, category, display, type, file, folder, desc, idx, width, height) VALUES (:name, :category, :display, :type, :file, :folder, :desc, :idx, :width, :height);", {
+            ":name": name, ":category": category, ":display": display, ":type": type, ":file": preview,
+            ":folder": folder, ":desc": description, ":idx": idx, ":width": w, ":height": h
+        })
 
     def finishCategory(self, category, total):
-        q = QSqlQuery(self.conn.db)
-        q.prepare("DELETE FROM models WHERE category == :category AND idx >= :total;")
-        q.bindValue(":category", category)
-        q.bindValue(":total", total)
-        self.conn.doQuery(q)
+        self.conn.write("DELETE FROM models WHERE category == :category AND idx >= :total;", {":category": category, ":total": total})
 
     def optionsUpdated(self):
         wildcards = self.gui.wildcards._sources
@@ -282,8 +265,7 @@ class Explorer(QObject):
         self.gui.aboutToQuit.connect(self.stop)
 
         self.conn = sql.Connection(self)
-        self.conn.connect()
-        self.conn.doQuery("CREATE TABLE models(name TEXT, category TEXT, display TEXT, type TEXT, file TEXT, folder TEXT, desc TEXT, idx INTEGER, width INTEGER, height INTEGER, CONSTRAINT unq UNIQUE (category, idx));")
+        self.conn.write("CREATE TABLE models(name TEXT, category TEXT, display TEXT, type TEXT, file TEXT, folder TEXT, desc TEXT, idx INTEGER, width INTEGER, height INTEGER, CONSTRAINT unq UNIQUE (category, idx));", wait=True)
     
         self._currentTab = "checkpoint"
         self._currentFolder = ""
@@ -361,24 +343,16 @@ class Explorer(QObject):
             image.save(file)
             self.gui.thumbnails.remove(file)
             self.gui.watchModelDirectory()
-            q = QSqlQuery(self.conn.db)
-            q.prepare("UPDATE models SET width = :width, height = :height WHERE file = :file;")
-            q.bindValue(":file", file)
-            q.bindValue(":width", image.width())
-            q.bindValue(":height", image.height())
-            self.conn.doQuery(q)
+            self.conn.write("UPDATE models SET width = :width, height = :height WHERE file = :file;",
+                            {":file": file, ":width": image.width(), ":height": image.height()})
             
     @pyqtSlot(str)
     def doClear(self, file):
         if os.path.exists(file):
             os.remove(file)
             self.gui.thumbnails.remove(file)
-            q = QSqlQuery(self.conn.db)
-            q.prepare("UPDATE models SET width = :width, height = :height WHERE file = :file;")
-            q.bindValue(":file", file)
-            q.bindValue(":width", 0)
-            q.bindValue(":height", 0)
-            self.conn.doQuery(q)
+            self.conn.write("UPDATE models SET width = :width, height = :height WHERE file = :file;",
+                            {":file": file, ":width": 0, ":height": 0})
     
     @pyqtSlot(str)
     def doDelete(self, file):
@@ -105,10 +105,34 @@ Rectangle {
             color: COMMON.bg4
         }
 
+        SComboBox {
+            id: sort
+            width: Math.min(gallery.width/3, 100)
+            anchors.top: parent.top
+            anchors.right: folderDivider.left
+            clip: true
+
+            property var fields: ["", "oldest", "model", "sampler", "seed", "steps", "scale", "size"]
+            model: [root.tr("Newest"), root.tr("Oldest"), root.tr("Model"), root.tr("Sampler"), root.tr("Seed"), root.tr("Steps"), root.tr("CFG"), root.tr("Size")]
+
+            onCurrentIndexChanged: {
+                root.releaseFocus()
+            }
+        }
+
+        Rectangle {
+            id: sortDivider
+            anchors.top: sort.top
+            anchors.bottom: sort.bottom
+            anchors.right: sort.left
+            width: 3
+            color: COMMON.bg4
+        }
+
         Rectangle {
             id: search
             anchors.left: parent.left
-            anchors.right: folderDivider.left
+            anchors.right: sortDivider.left
             height: 30
             color: COMMON.bg1
             clip: true
@@ -219,21 +243,13 @@ Rectangle {
 
                 //debug: true
 
-                query: {
-                    if(root.asleep) {
-                        return ""
-                    }
-                    var pre_str = "SELECT file, width, height, parameters FROM images WHERE folder = '" + folder.currentValue + "'"
-                    var post_str = " ORDER BY idx DESC;"
-
-                    var searches = search.text.split(";")
-                    var search_str = ""
-                    for(var i = 0; i < searches.length; i++) {
-                        search_str += " AND parameters LIKE '%" + searches[i].trim() + "%'"
-                    }
+                property var statement: GALLERY.searchQuery(folder.currentValue || "", search.text, sort.fields[sort.currentIndex] || "")
 
-                    return pre_str + search_str + post_str;
-                 }
+                query: root.asleep ? "" : statement.query
+                bindings: statement.bindings
+                countQuery: statement.count
+                key: "file"
+                pageSize: 256
                 
                 property bool reset: false
 
@@ -380,7 +396,7 @@ Rectangle {
             topPadding: 6
             bottomPadding: 2
             pointSize: 9
-            text: filesSql.partial ? root.tr("Loading...") : root.tr("%1 images").arg(gallery.count)
+            text: filesSql.partial ? root.tr("Loading...") : root.tr("%1 images").arg(filesSql.total)
         }
 
         Rectangle {
@@ -2,6 +2,8 @@ import QtQuick 2.15
 import QtQuick.Controls 2.15
 import QtGraphicalEffects 1.15
 
+import gui 1.0
+
 import "../../style"
 import "../../components"
 
@@ -50,21 +52,15 @@ GridView {
     }
 
     function getIndex(file) {
-        for(var i = 0; i < thumbView.model.length; i++) {
-            if(thumbView.model.get(i)["file"] == file) {
-                return i
-            }
-        }
-        return -1
+        return thumbView.model.indexOf(file)
     }
 
     function getSelectedFiles() {
         var current = getFile(currentIndex)
-        var pos = selected.indexOf(current)
-        if(pos == -1) {
+        if(current != null && selected.indexOf(current) == -1) {
             selected.push(current)
         }
-        return selected
+        return selected.filter(function(file) { return file != null })
     }
 
     function focusCurrent() {
@@ -76,6 +72,9 @@ GridView {
 
     function addToSelected(index) {
         var id = getFile(index)
+        if(id == null) {
+            return
+        }
         removeFromSelected(index)
         selected.push(id)
         selectedLength = selected.length
@@ -93,7 +92,7 @@ GridView {
     function setSelection(index) {
         var id = getFile(index)
         thumbView.currentIndex = index
-        thumbView.selected = [id]
+        thumbView.selected = id != null ? [id] : []
         thumbView.selectedLength = 1
     }
 
@@ -118,9 +117,12 @@ GridView {
             return;
         }
 
+        // paged models only hold a window of rows, so keys outside it are kept
+        // and pruned through keysRemoved instead
+        var paged = thumbView.model.pageSize > 0
         var remaining = []
         for(var i = 0; i < selected.length; i++) {
-            if(getIndex(selected[i]) != -1) {
+            if(selected[i] != null && (paged || getIndex(selected[i]) != -1)) {
                 remaining.push(selected[i])
             }
         }
@@ -129,17 +131,32 @@ GridView {
 
         var currentID = getFile(currentIndex)
 
-        if(selectedLength > 0 && !selected.includes(currentID)) {
+        if(currentID != null && selectedLength > 0 && !selected.includes(currentID)) {
             var idx = getIndex(selected[0])
             if(idx != -1) {
                 currentIndex = idx
-            } else {
-                selected = [getFile(currentIndex)]
+            } else if(!paged) {
+                selected = [currentID]
                 selectedLength = 1
             }
         }
     }
 
+    function removeSelected(keys) {
+        var remaining = selected.filter(function(file) { return file != null && !keys.includes(file) })
+        if(remaining.length != selected.length) {
+            selected = remaining
+            selectedLength = remaining.length
+        }
+    }
+
+    Connections {
+        target: thumbView.model
+        function onKeysRemoved(keys) {
+            thumbView.removeSelected(keys)
+        }
+    }
+
     function movedSelection(modifiers, prev, curr) {
         if(modifiers & Qt.ControlModifier) {
             addToSelected(curr)
@@ -148,7 +165,8 @@ GridView {
             addSelectionRange(prev, curr)
             applySelection()
         } else {
-            selected = [getFile(curr)]
+            var id = getFile(curr)
+            selected = id != null ? [id] : []
             applySelection()
         }
     }
@@ -204,6 +222,39 @@ GridView {
         height: 10
     }
 
+    property real prefetchY: 0
+    property real prefetchTime: 0
+
+    function prefetch() {
+        var now = Date.now()
+        var dt = (now - thumbView.prefetchTime) / 1000
+        var velocity = dt > 0 && dt < 1 ? (thumbView.contentY - thumbView.prefetchY) / (thumbView.cellHeight * dt) : 0
+        thumbView.prefetchY = thumbView.contentY
+        thumbView.prefetchTime = now
+        var columns = Math.max(Math.round(thumbView.width/thumbView.cellWidth), 1)
+        var first = Math.max(Math.floor(thumbView.contentY/thumbView.cellHeight), 0) * columns
+        var last = Math.ceil((thumbView.contentY + thumbView.height)/thumbView.cellHeight) * columns - 1
+        GUI.prefetchThumbnails(thumbView.model, first, last, columns, velocity)
+    }
+
+    onContentYChanged: {
+        if(!prefetchTimer.running) {
+            prefetchTimer.start()
+        }
+    }
+
+    onCountChanged: {
+        prefetchTimer.restart()
+    }
+
+    Timer {
+        id: prefetchTimer
+        interval: 100
+        onTriggered: {
+            thumbView.prefetch()
+        }
+    }
+
     delegate: Thumbnail {
         id: thumb
         width: cellWidth
@@ -3,9 +3,13 @@ import shutil
 import os
 import send2trash
 import glob
+import re
+import json
+import zlib
+import struct
 
 from PyQt5.QtCore import pyqtSlot, pyqtSignal, pyqtProperty, QObject, QThread, QUrl, QMimeData, Qt
-from PyQt5.QtSql import QSqlQuery
+from PyQt5.QtSql import QSqlQuery, QSqlDatabase
 from PyQt5.QtQml import qmlRegisterSingletonType
 from PyQt5.QtGui import QDesktopServices
 from PyQt5.QtWidgets import QApplication
@@ -14,6 +18,236 @@ import filesystem
 import parameters
 import time
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def readPNGText(chunk, data):
+    keyword, _, data = data.partition(b"\0")
+    keyword = keyword.decode("latin-1")
+    if chunk == b"tEXt":
+        return keyword, data.decode("latin-1")
+    if chunk == b"zTXt":
+        return keyword, zlib.decompress(data[1:]).decode("latin-1")
+    compressed = data[0]
+    _, _, data = data[2:].partition(b"\0")
+    _, _, data = data.partition(b"\0")
+    if compressed:
+        data = zlib.decompress(data)
+    return keyword, data.decode("utf-8")
+
+def readPNG(file):
+    w, h, p = 0, 0, ""
+    with open(file, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            raise ValueError("not a PNG")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length, chunk = struct.unpack(">I4s", header)
+            if chunk in {b"IDAT", b"IEND"}:
+                break
+            if chunk == b"IHDR":
+                w, h = struct.unpack(">II", f.read(length)[:8])
+            elif chunk in {b"tEXt", b"zTXt", b"iTXt"}:
+                keyword, text = readPNGText(chunk, f.read(length))
+                if keyword == "parameters":
+                    p = text
+            else:
+                f.seek(length, os.SEEK_CUR)
+            f.seek(4, os.SEEK_CUR)
+    return w, h, p
+
+def readImage(file):
+    try:
+        return readPNG(file)
+    except Exception:
+        pass
+    w, h, p = 0, 0, ""
+    with PIL.Image.open(file) as img:
+        if "parameters" in img.info:
+            p = img.info["parameters"]
+        w, h = img.size
+    return w, h, p
+
+INDEX_VERSION = 2
+
+FACETS = {
+    "model": "model", "sampler": "sampler", "seed": "seed", "steps": "steps",
+    "cfg": "scale", "scale": "scale", "width": "width", "height": "height"
+}
+NETWORK_FACETS = {"lora": "lora", "embedding": "embedding", "ti": "embedding"}
+NUMERIC_FACETS = {"seed", "steps", "scale", "width", "height"}
+
+SORTS = {
+    "": "idx DESC",
+    "oldest": "idx ASC",
+    "model": "model ASC, idx DESC",
+    "sampler": "sampler ASC, idx DESC",
+    "seed": "seed ASC, idx DESC",
+    "steps": "steps DESC, idx DESC",
+    "scale": "scale DESC, idx DESC",
+    "size": "width DESC, height DESC, idx DESC"
+}
+
+def readMetadata(p, embeddings=set()):
+    if not p:
+        return "", "", None, None, None, []
+
+    def number(value, kind):
+        try:
+            return kind(value)
+        except Exception:
+            return None
+
+    data = parameters.parseParameters(p)
+    prompt = data.get("prompt", "") + "\n" + data.get("negative_prompt", "")
+
+    networks = []
+    for name, strength, _ in re.findall(r"<@?lora:([^:>]+)(?::([-\d.]+))?(?::([-\d.]+))?>", prompt):
+        networks += [("lora", name, number(strength, float) if strength else 1.0)]
+    if embeddings:
+        for name in set(re.findall(r"[\w\-.]+", prompt.lower())) & embeddings:
+            networks += [("embedding", name, None)]
+
+    model = data.get("model", "") or data.get("UNET", "")
+    return model, data.get("sampler", ""), number(data.get("seed"), int), number(data.get("steps"), int), number(data.get("scale"), float), networks
+
+def parseFacet(clause):
+    if not ":" in clause:
+        return None
+    field, value = clause.split(":", 1)
+    field, value = field.strip().lower(), value.strip()
+    if not value or not (field in FACETS or field in NETWORK_FACETS):
+        return None
+    op = "="
+    for o in [">=", "<=", ">", "<"]:
+        if value.startswith(o):
+            op, value = o, value[len(o):].strip()
+            break
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        value = value[1:-1]
+    return field, op, value
+
+def parseSearch(text):
+    positive, negative, facets = [], [], []
+    for clause in text.split(";"):
+        clause = clause.strip()
+        negate = clause.startswith("-") and len(clause) > 1
+        if negate:
+            clause = clause[1:].strip()
+        facet = parseFacet(clause)
+        if facet:
+            facets += [(*facet, negate)]
+            continue
+        prefix = clause.endswith("*")
+        if prefix:
+            clause = clause[:-1].rstrip()
+        if len(clause) >= 2 and clause[0] == '"' and clause[-1] == '"':
+            clause = clause[1:-1]
+        if not clause:
+            continue
+        if negate:
+            negative += [(clause, prefix)]
+        else:
+            positive += [(clause, prefix)]
+    return positive, negative, facets
+
+def facetTerm(field, op, value, negate):
+    if field in NETWORK_FACETS:
+        term = "file IN (SELECT file FROM image_networks WHERE type = ? AND name = ?)"
+        bindings = [NETWORK_FACETS[field], value]
+    else:
+        column = FACETS[field]
+        if column in NUMERIC_FACETS:
+            try:
+                value = float(value) if column == "scale" else int(value)
+            except ValueError:
+                return None, []
+            term, bindings = f"{column} {op} ?", [value]
+        elif value.endswith("*"):
+            value = value[:-1].rstrip()
+            term, bindings = f"{column} >= ? AND {column} < ?", [value, value + "\uffff"]
+        else:
+            term, bindings = f"{column} = ?", [value]
+    if negate:
+        term = f"NOT ({term})"
+    return term, bindings
+
+def matchTerm(term, prefix):
+    return '"' + term.replace('"', '""') + '"' + ("*" if prefix else "")
+
+def searchable(term):
+    # the FTS tokenizer drops punctuation, a clause without any word characters has nothing to match
+    return any(c.isalnum() for c in term)
+
+def likeTerm(term):
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+class GalleryIndex():
+    def __init__(self, path):
+        self.db = QSqlDatabase.addDatabase("QSQLITE", "gallery_index")
+        self.db.setDatabaseName(path)
+        if not self.db.open():
+            raise RuntimeError(self.db.lastError().text())
+        self.query("PRAGMA journal_mode=WAL;")
+        self.query("PRAGMA synchronous=NORMAL;")
+        version = self.query("PRAGMA user_version;")
+        if version.next() and version.value(0) != INDEX_VERSION:
+            version.finish()
+            self.query("DROP TABLE IF EXISTS files;")
+            self.query(f"PRAGMA user_version = {INDEX_VERSION};")
+        self.query("CREATE TABLE IF NOT EXISTS files(file TEXT PRIMARY KEY, folder TEXT, mtime INTEGER, size INTEGER, parameters TEXT, width INTEGER, height INTEGER, model TEXT, sampler TEXT, seed INTEGER, steps INTEGER, scale REAL, networks TEXT);")
+        self.query("CREATE INDEX IF NOT EXISTS files_folder ON files(folder);")
+
+    def query(self, q):
+        query = QSqlQuery(self.db)
+        query.exec(q)
+        return query
+
+    def lookup(self, files):
+        found = {}
+        for i in range(0, len(files), 256):
+            chunk = files[i:i+256]
+            q = QSqlQuery(self.db)
+            q.prepare(f"SELECT file, mtime, size, parameters, width, height, model, sampler, seed, steps, scale, networks FROM files WHERE file IN ({','.join(['?']*len(chunk))});")
+            for f in chunk:
+                q.addBindValue(f)
+            q.exec()
+            while q.next():
+                found[q.value(0)] = tuple(q.value(i) for i in range(1, 12))
+        return found
+
+    def update(self, rows):
+        if not rows:
+            return
+        self.db.transaction()
+        q = QSqlQuery(self.db)
+        q.prepare("INSERT OR REPLACE INTO files(file, folder, mtime, size, parameters, width, height, model, sampler, seed, steps, scale, networks) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);")
+        for column in zip(*rows):
+            q.addBindValue(list(column))
+        q.execBatch()
+        self.db.commit()
+
+    def remove(self, files):
+        if not files:
+            return
+        self.db.transaction()
+        q = QSqlQuery(self.db)
+        q.prepare("DELETE FROM files WHERE file == ?;")
+        q.addBindValue(files)
+        q.execBatch()
+        self.db.commit()
+
+    def prune(self, folder):
+        q = QSqlQuery(self.db)
+        q.prepare("SELECT file FROM files WHERE folder == ?;")
+        q.addBindValue(folder)
+        q.exec()
+        files = []
+        while q.next():
+            files += [q.value(0)]
+        self.remove([f for f in files if not os.path.exists(f)])
+
 class Populater(QObject):
     forceReload = pyqtSignal(str)
     stop = pyqtSignal(str)
@@ -35,26 +269,54 @@ class Populater(QObject):
             os.makedirs(os.path.join(self.output, s), exist_ok=True)
 
         self.conn = None
+        self.index = None
         self.watcher = gui.watcher
         self.folders = set()
         self.working = set()
         self.fresh = set()
+        self.pruned = set()
         self.initial = True
+        self.fts = False
 
     @pyqtSlot()
     def started(self):
         self.conn = sql.Connection(self)
-        self.conn.connect()
-        self.conn.doQuery("CREATE TABLE folders(folder TEXT UNIQUE, name TEXT UNIQUE, idx INTEGER UNIQUE);")
-        self.conn.doQuery("CREATE TABLE images(file TEXT UNIQUE, folder TEXT, parameters TEXT, idx INTEGER, width INTEGER, height INTEGER, CONSTRAINT unq UNIQUE (folder, idx));")
-        self.conn.enableNotifications("folders")
+        self.conn.write("CREATE TABLE folders(folder TEXT UNIQUE, name TEXT UNIQUE, idx INTEGER UNIQUE);")
+        self.conn.write("CREATE TABLE images(file TEXT UNIQUE, folder TEXT, parameters TEXT, idx INTEGER, width INTEGER, height INTEGER, model TEXT COLLATE NOCASE, sampler TEXT COLLATE NOCASE, seed INTEGER, steps INTEGER, scale REAL, CONSTRAINT unq UNIQUE (folder, idx));")
+        for column in ["model", "sampler", "seed", "steps", "scale", "width, height"]:
+            name = column.split(",")[0]
+            self.conn.write(f"CREATE INDEX images_{name} ON images(folder, {column}, idx);")
+        self.conn.write("CREATE TABLE image_networks(file TEXT, type TEXT, name TEXT COLLATE NOCASE, strength REAL);")
+        self.conn.write("CREATE INDEX image_networks_name ON image_networks(type, name, file);")
+        self.conn.write("CREATE INDEX image_networks_file ON image_networks(file);")
+        self.conn.write("CREATE TRIGGER images_networks_delete AFTER DELETE ON images BEGIN DELETE FROM image_networks WHERE file = old.file; END;")
+        self.prepareSearch()
+        self.conn.enableNotifications("folders", "folder")
         self.conn.disableNotifications("images")
 
+        if self.gui.config.get("gallery_index"):
+            try:
+                self.index = GalleryIndex(os.path.join(self.output, "index.db"))
+            except Exception as e:
+                print("INDEX", e)
+                self.index = None
+
         self.prepareFolders()
 
         self.watcher.finished.connect(self.onFinished)
         self.watcher.folder_changed.connect(self.onResult)
+        self.watcher.folder_removed.connect(self.onRemoved)
         self.watcher.parent_changed.connect(self.onParentChanged)
+        self.gui.outputSaved.connect(self.onSaved)
+
+    def prepareSearch(self):
+        job = self.conn.write("CREATE VIRTUAL TABLE images_fts USING fts5(parameters, content='images', content_rowid='rowid');", wait=True)
+        if job.errored:
+            return
+        self.conn.write("CREATE TRIGGER images_fts_insert AFTER INSERT ON images BEGIN INSERT INTO images_fts(rowid, parameters) VALUES (new.rowid, new.parameters); END;")
+        self.conn.write("CREATE TRIGGER images_fts_delete AFTER DELETE ON images BEGIN INSERT INTO images_fts(images_fts, rowid, parameters) VALUES ('delete', old.rowid, old.parameters); END;")
+        self.conn.write("CREATE TRIGGER images_fts_update AFTER UPDATE ON images BEGIN INSERT INTO images_fts(images_fts, rowid, parameters) VALUES ('delete', old.rowid, old.parameters); INSERT INTO images_fts(rowid, parameters) VALUES (new.rowid, new.parameters); END;")
+        self.fts = True
 
     def prepareFolders(self):
         subfolders = [s.rsplit(os.path.sep,1)[-1] for s in list(filter(os.path.isdir, glob.glob(self.output + "/*")))]
@@ -73,19 +335,12 @@ class Populater(QObject):
             else:
                 self.remaining += [folder]
 
-            q = QSqlQuery(self.conn.db)
-            q.prepare("INSERT OR REPLACE INTO folders(folder, name, idx) VALUES (:folder, :name, :idx);")
-            q.bindValue(":folder", folder)
-            q.bindValue(":name", label)
-            q.bindValue(":idx", idx)
-            self.conn.doQuery(q)
+            self.conn.write("INSERT OR REPLACE INTO folders(folder, name, idx) VALUES (:folder, :name, :idx);",
+                            {":folder": folder, ":name": label, ":idx": idx})
             self.folders.add(folder)
             self.fresh.add(folder)
 
-        q = QSqlQuery(self.conn.db)
-        q.prepare("DELETE FROM folders WHERE idx >= :total;")
-        q.bindValue(":total", len(subfolders))
-        self.conn.doQuery(q)
+        self.conn.write("DELETE FROM folders WHERE idx >= :total;", {":total": len(subfolders)})
 
     def resumeFolders(self):
         for subfolder in self.remaining:
@@ -103,11 +358,12 @@ class Populater(QObject):
         if not folder in self.folders:
             return
 
-        q = QSqlQuery(self.conn.db)
-        q.prepare("DELETE FROM images WHERE folder == :folder AND idx >= :total;")
-        q.bindValue(":folder", folder)
-        q.bindValue(":total", total)
-        self.conn.doQuery(q)
+        self.conn.write("DELETE FROM images WHERE folder == :folder AND idx >= :total;", {":folder": folder, ":total": total})
+
+        # later deletions arrive through onRemoved, only files removed while closed need the disk check
+        if self.index and not folder in self.pruned:
+            self.pruned.add(folder)
+            self.index.prune(folder)
 
         self.working.discard(folder)
         self.fresh.discard(folder)
@@ -115,10 +371,47 @@ class Populater(QObject):
             self.gui.setTabWorking(self.name, False)
 
         if folder == self.primary:
-            self.conn.enableNotifications("images")
+            self.conn.enableNotifications("images", "file")
             self.initial = False
             self.resumeFolders()
 
+    def embeddings(self):
+        if not "TI" in self.gui._options:
+            return set()
+        return set([self.gui.modelName(n).lower() for n in self.gui._options["TI"]])
+
+    @pyqtSlot(str, int, int, str)
+    def onSaved(self, file, width, height, parameters):
+        parent = os.path.dirname(file)
+        folder = next((f for f in self.folders if os.path.abspath(f) == parent), None)
+        if not folder or width == 0 or height == 0:
+            return
+
+        metadata = readMetadata(parameters, self.embeddings())
+        self.conn.write("INSERT OR REPLACE INTO images(file, folder, parameters, idx, width, height, model, sampler, seed, steps, scale) VALUES (:file, :folder, :param, COALESCE((SELECT idx FROM images WHERE file == :match), (SELECT MAX(idx) + 1 FROM images WHERE folder == :parent), 0), :width, :height, :model, :sampler, :seed, :steps, :scale);", {
+            ":file": file, ":folder": folder, ":param": parameters.replace("'", "''"), ":match": file, ":parent": folder,
+            ":width": width, ":height": height, ":model": metadata[0], ":sampler": metadata[1], ":seed": metadata[2], ":steps": metadata[3], ":scale": metadata[4]
+        })
+        if metadata[5]:
+            columns = list(zip(*[(file, *n) for n in metadata[5]]))
+            self.conn.writeBatch("INSERT INTO image_networks(file, type, name, strength) VALUES (?, ?, ?, ?);", [list(c) for c in columns])
+
+        if self.index:
+            try:
+                stat = os.stat(file)
+                self.index.update([(file, folder, stat.st_mtime_ns, stat.st_size, parameters, width, height, *metadata[:5], json.dumps(metadata[5]))])
+            except OSError:
+                pass
+
+    @pyqtSlot(str, list)
+    def onRemoved(self, folder, files):
+        if not folder in self.folders:
+            return
+        self.conn.writeBatch("DELETE FROM images WHERE file == ?;", [files])
+        if self.index:
+            self.index.remove(files)
+        self.gui.thumbnails.removeAll(files)
+
     @pyqtSlot(str, list, list)
     def onResult(self, folder, files, idxs):
         if not folder in self.folders:
@@ -129,17 +422,28 @@ class Populater(QObject):
         self.working.add(folder)
 
         data = zip(files, idxs)
+        indexed = self.index.lookup(files) if self.index else {}
+        changed = []
+
+        embeddings = self.embeddings()
         
         files, folders, idxs, widths, heights, parameters = [], [], [], [], [], []
+        models, samplers, seeds, steps, scales = [], [], [], [], []
+        networks = []
         for f, i in data:
             if not f.split(".")[-1] in {"png"}:
                 continue
             w, h, p = 0, 0, ""
             try:
-                with PIL.Image.open(f) as img:
-                    if "parameters" in img.info:
-                        p = img.info["parameters"]
-                    w, h = img.size
+                stat = os.stat(f)
+                entry = indexed.get(f, None)
+                if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                    p, w, h = entry[2], entry[3], entry[4]
+                    metadata = (*entry[5:10], json.loads(entry[10] or "[]"))
+                else:
+                    w, h, p = readImage(f)
+                    metadata = readMetadata(p, embeddings)
+                    changed += [(f, folder, stat.st_mtime_ns, stat.st_size, p, w, h, *metadata[:5], json.dumps(metadata[5]))]
             except Exception:
                 continue
             if w == 0 or h == 0:
@@ -150,18 +454,26 @@ class Populater(QObject):
             widths += [w]
             heights += [h]
             parameters += [p.replace("'", "''")]
-
-        q = QSqlQuery(self.conn.db)
-        q.prepare(f"INSERT OR REPLACE INTO images(file, folder, parameters, idx, width, height) VALUES (:file, :folder, :param, :idx, :width, :height);")
-        q.bindValue(":file", files)
-        q.bindValue(":folder", folders)
-        q.bindValue(":param", parameters)
-        q.bindValue(":idx", idxs)
-        q.bindValue(":width", widths)
-        q.bindValue(":height", heights)
-        q.execBatch()
+            models += [metadata[0]]
+            samplers += [metadata[1]]
+            seeds += [metadata[2]]
+            steps += [metadata[3]]
+            scales += [metadata[4]]
+            networks += [(f, *n) for n in metadata[5]]
+
+        job = self.conn.writeBatch("INSERT OR REPLACE INTO images(file, folder, parameters, idx, width, height, model, sampler, seed, steps, scale) VALUES (:file, :folder, :param, :idx, :width, :height, :model, :sampler, :seed, :steps, :scale);", {
+            ":file": files, ":folder": folders, ":param": parameters, ":idx": idxs, ":width": widths, ":height": heights,
+            ":model": models, ":sampler": samplers, ":seed": seeds, ":steps": steps, ":scale": scales
+        })
+        if networks:
+            columns = list(zip(*networks))
+            job = self.conn.writeBatch("INSERT INTO image_networks(file, type, name, strength) VALUES (?, ?, ?, ?);", [list(c) for c in columns])
+
+        if self.index:
+            self.index.update(changed)
 
         if self.initial:
+            job.wait()
             self.forceReload.emit(folder)
 
 class Deleter(QThread):
@@ -293,10 +605,55 @@ class Gallery(QObject):
         if folder == self.folder:
             self.forceReload.emit()
 
+    @pyqtSlot(str, str, str, result='QVariant')
+    def searchQuery(self, folder, text, sort):
+        positive, negative, facets = parseSearch(text)
+
+        terms = ["folder = ?"]
+        bindings = [folder]
+        matched = -1
+
+        if self.populater.fts:
+            positive = [(t, p) for t, p in positive if searchable(t)]
+            negative = [(t, p) for t, p in negative if searchable(t)]
+            if positive:
+                matched = len(terms)
+                terms += ["images.rowid IN (SELECT rowid FROM images_fts WHERE images_fts MATCH ?)"]
+                bindings += [" AND ".join([matchTerm(t, p) for t, p in positive])]
+            if negative:
+                terms += ["images.rowid NOT IN (SELECT rowid FROM images_fts WHERE images_fts MATCH ?)"]
+                bindings += [" OR ".join([matchTerm(t, p) for t, p in negative])]
+        else:
+            for t, _ in positive:
+                terms += ["parameters LIKE ? ESCAPE '\\'"]
+                bindings += [likeTerm(t)]
+            for t, _ in negative:
+                terms += ["parameters NOT LIKE ? ESCAPE '\\'"]
+                bindings += [likeTerm(t)]
+
+        for facet in facets:
+            term, values = facetTerm(*facet)
+            if term:
+                terms += [term]
+                bindings += values
+
+        # pages walk the (folder, sort) index so LIMIT stops early, the match list is only a filter
+        query = f"SELECT file, width, height, parameters FROM images WHERE {' AND '.join(terms)} ORDER BY {SORTS.get(sort, SORTS[''])};"
+
+        # the count has to visit every match anyway, driving it from the FTS index skips the rest of the folder
+        count = ""
+        if matched != -1:
+            terms[matched] = "images_fts MATCH ?"
+            count = f"SELECT COUNT(*) FROM images_fts CROSS JOIN images ON images.rowid = images_fts.rowid WHERE {' AND '.join(terms)};"
+
+        return {"query": query, "bindings": bindings, "count": count}
+
     @pyqtProperty(str, notify=update)
     def currentFolder(self):
         return self.folder
     
     @currentFolder.setter
     def currentFolder(self, folder):
-        self.folder = folder
\ No newline at end of file
+        self.folder = folder
+        self.gui.thumbnails.setFolder(folder)
+        self.gui.watcher.setPriority(folder)
\ No newline at end of file
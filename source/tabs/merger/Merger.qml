@@ -1430,6 +1430,7 @@ Rectangle {
                 model: Sql {
                     id: outputsSql
                     query: "SELECT id FROM merge_outputs ORDER BY id DESC;"
+                    key: "id"
                 }
 
                 ScrollBar.horizontal: SScrollBarH { 
@@ -13,7 +13,6 @@ import manager
 
 from PyQt5.QtCore import pyqtProperty, pyqtSignal, QObject, pyqtSlot, QUrl, QThread, QThreadPool
 from PyQt5.QtQml import qmlRegisterSingletonType, qmlRegisterUncreatableType
-from PyQt5.QtSql import QSqlQuery
 from PyQt5.QtGui import QImage
 
 class MergeOperation(QObject):
@@ -317,9 +316,8 @@ class Merger(QObject):
         self.gui.reset.connect(self.handleReset)
 
         self.conn = sql.Connection(self)
-        self.conn.connect()
-        self.conn.doQuery("CREATE TABLE merge_outputs(id INTEGER);")
-        self.conn.enableNotifications("merge_outputs")
+        self.conn.write("CREATE TABLE merge_outputs(id INTEGER);", wait=True)
+        self.conn.enableNotifications("merge_outputs", "id")
 
         self._manager.result.connect(self.onResult)
         self._manager.artifact.connect(self.onArtifact)
@@ -662,10 +660,7 @@ class Merger(QObject):
 
     def createOutput(self, id, image):
         self._outputs[id] = BasicOutput(self, image)
-        q = QSqlQuery(self.conn.db)
-        q.prepare("INSERT INTO merge_outputs(id) VALUES (:id);")
-        q.bindValue(":id", id)
-        self.conn.doQuery(q)
+        self.conn.write("INSERT INTO merge_outputs(id) VALUES (:id);", {":id": id})
 
     @pyqtSlot(int, QImage, object, str)
     def onResult(self, id, image, metadata, filename):
@@ -782,10 +777,7 @@ class Merger(QObject):
             return
         del self._outputs[id]
         self.updated.emit()
-        q = QSqlQuery(self.conn.db)
-        q.prepare("DELETE FROM merge_outputs WHERE id = :id;")
-        q.bindValue(":id", id)
-        self.conn.doQuery(q)
+        self.conn.write("DELETE FROM merge_outputs WHERE id = :id;", {":id": id})
     
     @pyqtSlot(int)
     def deleteOutputAfter(self, id):
@@ -793,10 +785,7 @@ class Merger(QObject):
             if i < id:
                 del self._outputs[i]
         
-        q = QSqlQuery(self.conn.db)
-        q.prepare("DELETE FROM merge_outputs WHERE id < :idx;")
-        q.bindValue(":idx", id)
-        self.conn.doQuery(q)
+        self.conn.write("DELETE FROM merge_outputs WHERE id < :idx;", {":idx": id})
         self.updated.emit()
 
     @pyqtSlot()
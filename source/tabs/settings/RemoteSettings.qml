@@ -74,6 +74,17 @@ Item {
             bindKey: "password"
         }
 
+        OChoice {
+            width: parent.width
+            height: 30
+            label: root.tr("Transport")
+            currentIndex: GUI.config.get("remote_async") ? 1 : 0
+            entries: [root.tr("Polling"), root.tr("Async")]
+            onCurrentIndexChanged: {
+                GUI.config.set("remote_async", currentIndex != 0)
+            }
+        }
+
         SButton {
             width: parent.width
             height: 30
@@ -1,8 +1,14 @@
 import io
 import os
+import mmap
+import time
+import heapq
+import hashlib
+import struct
 import threading
+import collections
 
-from PyQt5.QtCore import pyqtSlot, pyqtSignal, QObject, QMutex, QThreadPool, QUrl, QByteArray, QThread, QSize
+from PyQt5.QtCore import pyqtSlot, pyqtSignal, QObject, QMutex, QThreadPool, QUrl, QByteArray, QThread, QSize, QTimer
 from PyQt5.QtSql import QSqlQuery
 from PyQt5.QtQuick import QQuickImageProvider, QQuickAsyncImageProvider, QQuickImageResponse, QQuickTextureFactory
 from PyQt5.QtGui import QImage
@@ -12,19 +18,363 @@ import PIL.Image
 import filesystem
 import sql
 
-def get_thumbnail(file, size, quality):
+THUMBNAIL_BUDGET = 128*1024*1024
+BIG_THUMBNAIL_BUDGET = 256*1024*1024
+STORE_RECORD = struct.Struct("<HHqqQI")
+STORE_COMPACT_MIN = 16*1024*1024
+STORE_FOLDER = os.path.join("cache", "thumbnails")
+THUMBNAIL_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+VISIBLE_PRIORITY = 0
+PREFETCH_PRIORITY = 1
+IDLE_PRIORITY = 2
+PREFETCH_ROWS = 2
+PREFETCH_MAX_ROWS = 16
+PREFETCH_LOOKAHEAD = 0.5
+PREFETCH_IDLE = 3.0
+
+def get_thumbnails(file, sizes):
+    image = PIL.Image.open(file)
+    image.draft("RGB", max(sizes))
+    return make_thumbnails(image, sizes)
+
+def make_thumbnails(image, sizes):
+    if not image.mode in {"RGB", "RGBA", "L", "LA"}:
+        image = image.convert('RGB')
+    out = {}
+    for size in sorted(sizes, reverse=True):
+        factor = min(image.width // (size[0] * 2), image.height // (size[1] * 2))
+        if factor > 1:
+            image = image.reduce(factor)
+        image = image.convert('RGB')
+        image.thumbnail(size, PIL.Image.Resampling.LANCZOS)
+        out[size] = image
+    return out
+
+def encode_thumbnail(image, quality):
     blob = io.BytesIO()
-    image = PIL.Image.open(file).convert('RGB')
-    image.thumbnail(size, PIL.Image.Resampling.LANCZOS)
     image.save(blob, "JPEG", quality=quality)
     return blob.getvalue()
 
+def to_qimage(image):
+    return QImage(image.tobytes(), image.width, image.height, image.width * 3, QImage.Format_RGB888).copy()
+
+def get_thumbnail(file, size, quality):
+    return encode_thumbnail(get_thumbnails(file, [size])[size], quality)
+
+class ThumbnailCache():
+    def __init__(self, budget):
+        self.entries = collections.OrderedDict()
+        self.budget = budget
+        self.used = 0
+        self.pinned = set()
+        self.pinnedUsed = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, file):
+        entry = self.entries.get(file, None)
+        if entry == None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(file)
+        return entry[0]
+
+    def put(self, file, value):
+        self.remove(file)
+        cost = len(value)
+        self.entries[file] = (value, cost)
+        self.used += cost
+        if file in self.pinned:
+            self.pinnedUsed += cost
+        self.evict()
+
+    def remove(self, file):
+        entry = self.entries.pop(file, None)
+        if entry == None:
+            return
+        self.used -= entry[1]
+        if file in self.pinned:
+            self.pinnedUsed -= entry[1]
+
+    def pin(self, files):
+        self.pinned = set(files)
+        self.pinnedUsed = sum([self.entries[f][1] for f in self.pinned if f in self.entries])
+
+    def evict(self):
+        skipped = 0
+        while self.used > self.budget and len(self.entries) > skipped:
+            file = next(iter(self.entries))
+            if file in self.pinned and self.pinnedUsed <= self.budget:
+                self.entries.move_to_end(file)
+                skipped += 1
+                continue
+            self.remove(file)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "used_mb": round(self.used / (1024*1024), 2),
+            "budget_mb": round(self.budget / (1024*1024), 2),
+            "pinned": len(self.pinned),
+            "pinned_mb": round(self.pinnedUsed / (1024*1024), 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+def store_path(folder):
+    # outside the output and model folders, writes there wake their watchers and rescan the gallery and models
+    name = hashlib.sha1(os.path.abspath(folder).encode("utf-8")).hexdigest()[:16]
+    return os.path.abspath(os.path.join(STORE_FOLDER, name))
+
+class ThumbnailStore():
+    def __init__(self, folder, path):
+        self.folder = os.path.abspath(folder)
+        self.packPath = os.path.join(path, "thumbnails.pack")
+        self.indexPath = os.path.join(path, "thumbnails.idx")
+        self.guard = threading.Lock()
+        self.entries = {}
+        self.pack = None
+        self.index = None
+        self.map = None
+        self.mapped = 0
+        self.live = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.writes = 0
+        self.compactions = 0
+        self.compactor = None
+        self.open()
+
+    def open(self):
+        self.removeTemp()
+        self.entries = {}
+        self.live = 0
+        valid = 0
+        if os.path.exists(self.indexPath):
+            with open(self.indexPath, "rb") as f:
+                data = f.read()
+            while valid + STORE_RECORD.size <= len(data):
+                length, width, mtime, size, offset, count = STORE_RECORD.unpack_from(data, valid)
+                end = valid + STORE_RECORD.size + length
+                if end > len(data):
+                    break
+                file = data[valid + STORE_RECORD.size:end].decode("utf-8")
+                self.setEntry((file, width), (mtime, size, offset, count))
+                valid = end
+        self.pack = open(self.packPath, "a+b")
+        self.index = open(self.indexPath, "a+b")
+        self.index.truncate(valid)
+        self.map = None
+        self.mapped = 0
+
+    def close(self):
+        if self.map:
+            self.map.close()
+        if self.pack:
+            self.pack.close()
+        if self.index:
+            self.index.close()
+        self.map, self.pack, self.index = None, None, None
+        self.mapped = 0
+
+    def setEntry(self, key, entry):
+        old = self.entries.get(key, None)
+        if old:
+            self.live -= old[3]
+        self.entries[key] = entry
+        self.live += entry[3]
+
+    def dropEntry(self, key):
+        old = self.entries.pop(key, None)
+        if old:
+            self.live -= old[3]
+
+    def discard(self, file, sizes):
+        with self.guard:
+            for size in sizes:
+                self.dropEntry((self.relative(file), size[0]))
+
+    def contains(self, file):
+        return os.path.abspath(file).startswith(self.folder + os.path.sep)
+
+    def relative(self, file):
+        return os.path.relpath(os.path.abspath(file), self.folder)
+
+    def remap(self, end):
+        if end <= self.mapped:
+            return
+        if self.map:
+            self.map.close()
+        self.pack.flush()
+        self.map = mmap.mmap(self.pack.fileno(), 0, access=mmap.ACCESS_READ)
+        self.mapped = len(self.map)
+
+    def get(self, file, size):
+        # entries are only checked against the file when read, stale ones are dropped and left for compaction
+        key = (self.relative(file), size[0])
+        try:
+            stat = os.stat(file)
+        except OSError:
+            stat = None
+        with self.guard:
+            entry = self.entries.get(key, None)
+            if not entry or not self.pack:
+                self.misses += 1
+                return None
+            if not stat or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+                self.stale += 1
+                self.dropEntry(key)
+                return None
+            self.remap(entry[2] + entry[3])
+            self.hits += 1
+            return bytes(self.map[entry[2]:entry[2]+entry[3]])
+
+    def has(self, file, size):
+        key = (self.relative(file), size[0])
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return False
+        with self.guard:
+            entry = self.entries.get(key, None)
+            return entry != None and entry[:2] == (stat.st_mtime_ns, stat.st_size)
+
+    def put(self, file, size, blob):
+        key = (self.relative(file), size[0])
+        stat = os.stat(file)
+        path = key[0].encode("utf-8")
+        with self.guard:
+            if not self.pack:
+                return
+            offset = self.pack.seek(0, os.SEEK_END)
+            self.pack.write(blob)
+            self.pack.flush()
+            entry = (stat.st_mtime_ns, stat.st_size, offset, len(blob))
+            self.index.write(STORE_RECORD.pack(len(path), size[0], *entry) + path)
+            self.index.flush()
+            self.setEntry(key, entry)
+            self.writes += 1
+            wasted = offset + len(blob) - self.live
+        if wasted > max(STORE_COMPACT_MIN, self.live):
+            self.compactInBackground()
+
+    def compactInBackground(self):
+        with self.guard:
+            if self.compactor and self.compactor.is_alive():
+                return
+            self.compactor = threading.Thread(target=self.compact, daemon=True)
+            self.compactor.start()
+
+    def compact(self):
+        try:
+            self.doCompact()
+        except Exception as e:
+            print("THUMBNAILS", e)
+
+    def doCompact(self):
+        with self.guard:
+            if not self.pack:
+                return
+            entries = dict(self.entries)
+            end = self.pack.seek(0, os.SEEK_END)
+
+        live = {}
+        for key, entry in entries.items():
+            try:
+                stat = os.stat(os.path.join(self.folder, key[0]))
+            except OSError:
+                continue
+            if entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                live[key] = entry
+
+        used = sum([entry[3] for entry in live.values()])
+        if end - used < max(STORE_COMPACT_MIN, used // 2):
+            return
+
+        packTemp, indexTemp = self.packPath + ".tmp", self.indexPath + ".tmp"
+        src = open(self.packPath, "rb")
+        pack = open(packTemp, "wb")
+        index = open(indexTemp, "wb")
+        try:
+            for key, entry in live.items():
+                self.copyEntry(src, pack, index, key, entry)
+
+            with self.guard:
+                if not self.pack:
+                    return
+                self.pack.flush()
+                for key, entry in self.entries.items():
+                    if entry[2] >= end:
+                        self.copyEntry(src, pack, index, key, entry)
+                src.close()
+                pack.close()
+                index.close()
+                self.close()
+                try:
+                    open(self.indexPath, "wb").close()
+                    os.replace(packTemp, self.packPath)
+                    os.replace(indexTemp, self.indexPath)
+                    self.compactions += 1
+                finally:
+                    self.open()
+        finally:
+            src.close()
+            pack.close()
+            index.close()
+            self.removeTemp()
+
+    def removeTemp(self):
+        for path in [self.packPath + ".tmp", self.indexPath + ".tmp"]:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def copyEntry(self, src, pack, index, key, entry):
+        src.seek(entry[2])
+        blob = src.read(entry[3])
+        offset = pack.tell()
+        pack.write(blob)
+        path = key[0].encode("utf-8")
+        index.write(STORE_RECORD.pack(len(path), key[1], entry[0], entry[1], offset, len(blob)) + path)
+
+    def stop(self):
+        compactor = self.compactor
+        if compactor:
+            compactor.join()
+        with self.guard:
+            self.close()
+
+    def stats(self):
+        with self.guard:
+            size = self.pack.seek(0, os.SEEK_END) if self.pack else 0
+            return {
+                "entries": len(self.entries),
+                "pack_mb": round(size / (1024*1024), 2),
+                "wasted_mb": round((size - self.live) / (1024*1024), 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "writes": self.writes,
+                "compactions": self.compactions
+            }
+
 class ThumbnailStorage(QObject):
     instance = None
     def __init__(self, size, big_size, quality, parent=None):
         super().__init__(parent)
-        self.cache = {size: {}, big_size: {}}
+        self.cache = {size: ThumbnailCache(THUMBNAIL_BUDGET), big_size: ThumbnailCache(BIG_THUMBNAIL_BUDGET)}
+        self.quality = quality
         self.guard = QMutex()
+        self.stores = {}
+        self.pool = ThumbnailPool(THUMBNAIL_WORKERS)
+        self.prefetcher = ThumbnailPrefetcher(self, size, quality, self)
         ThumbnailStorage.instance = self
 
         self.async_provider = AsyncThumbnailProvider(size, quality)
@@ -33,73 +383,377 @@ class ThumbnailStorage(QObject):
 
     def get(self, file, size):
         self.guard.lock()
-        image = self.cache[size].get(file, None)
+        blob = self.cache[size].get(file)
         self.guard.unlock()
-        return image
-    def put(self, file, image, size):
+        if blob == None:
+            return None
+        return QImage.fromData(QByteArray(blob), "JPG")
+    def put(self, file, blob, size):
         self.guard.lock()
-        self.cache[size][file] = image
+        self.cache[size].put(file, blob)
         self.guard.unlock()
     def has(self, file, size):
         self.guard.lock()
-        out = file in self.cache[size]
+        out = file in self.cache[size].entries
         self.guard.unlock()
         return out
     def remove(self, file):
-        self.guard.lock()
-        for size in self.cache:
-            if file in self.cache[size]:
-                del self.cache[size][file]
-        self.guard.unlock()
+        self.removeAll([file])
     def removeAll(self, files):
         self.guard.lock()
         for size in self.cache:
             for file in files:
-                if file in self.cache[size]:
-                    del self.cache[size][file]
+                self.cache[size].remove(file)
+        self.guard.unlock()
+        for file in files:
+            store = self.storeFor(file)
+            if store:
+                store.discard(file, list(self.cache))
+    def full(self, size):
+        self.guard.lock()
+        cache = self.cache[size]
+        out = cache.used + cache.used // max(len(cache.entries), 1) > cache.budget
+        self.guard.unlock()
+        return out
+    def pin(self, size, files):
+        self.guard.lock()
+        self.cache[size].pin(files)
+        self.guard.unlock()
+    def setFolder(self, folder):
+        self.prefetcher.setFolder(folder)
+    def setStores(self, folders):
+        folders = set([os.path.abspath(f) for f in folders if f])
+        self.guard.lock()
+        closed = [self.stores.pop(f) for f in list(self.stores.keys()) if not f in folders]
+        for folder in folders:
+            if folder in self.stores:
+                continue
+            try:
+                path = store_path(folder)
+                os.makedirs(path, exist_ok=True)
+                self.stores[folder] = ThumbnailStore(folder, path)
+            except Exception as e:
+                print("THUMBNAILS", e)
+        self.guard.unlock()
+        for store in closed:
+            store.stop()
+    def storeFor(self, file):
+        self.guard.lock()
+        stores = [s for s in self.stores.values() if s.contains(file)]
+        self.guard.unlock()
+        store = max(stores, key=lambda s: len(s.folder)) if stores else None
+        return store
+    def fetch(self, file, size, quality):
+        image = None
+        store = self.storeFor(file)
+        blob = store.get(file, size) if store else None
+        if blob:
+            image = QImage.fromData(QByteArray(blob), "JPG")
+        if image is None or image.isNull():
+            sizes = [size] + [s for s in self.cache if s != size and not self.has(file, s) and not (store and store.has(file, s))]
+            images = get_thumbnails(file, sizes)
+            for s in sizes:
+                encoded = encode_thumbnail(images[s], quality)
+                if store:
+                    store.put(file, s, encoded)
+                if s == size:
+                    blob = encoded
+                elif not store:
+                    self.put(file, encoded, s)
+            image = to_qimage(images[size])
+        self.put(file, blob, size)
+        return image
+    def prime(self, file, image):
+        sizes = list(self.cache.keys())
+        images = make_thumbnails(image, sizes)
+        store = self.storeFor(file)
+        for size in sizes:
+            blob = encode_thumbnail(images[size], self.quality)
+            if store:
+                store.put(file, size, blob)
+            self.put(file, blob, size)
+    def stop(self):
+        self.prefetcher.stop()
+        self.pool.stop()
+        self.guard.lock()
+        stores = list(self.stores.values())
+        self.stores = {}
+        self.guard.unlock()
+        for store in stores:
+            store.stop()
+    def setBudget(self, size, budget):
+        self.guard.lock()
+        self.cache[size].budget = budget
+        self.cache[size].evict()
+        self.guard.unlock()
+    def stats(self):
+        self.guard.lock()
+        out = {f"{size[0]}": cache.stats() for size, cache in self.cache.items()}
+        stores = list(self.stores.values())
         self.guard.unlock()
+        out["disk"] = {store.folder: store.stats() for store in stores}
+        out["pool"] = self.pool.stats()
+        out["prefetch"] = self.prefetcher.stats()
+        return out
 
 class ThumbnailResponseRunnableSignals(QObject):
     done = pyqtSignal('QImage')
 
-class ThumbnailResponseRunnable(threading.Thread):
+class ThumbnailResponseRunnable():
     def __init__(self, file, size, quality):
-        super().__init__()
         self.size = size
         self.quality = quality
         self.file = file
         self.signals = ThumbnailResponseRunnableSignals()
         self.image = None
-        self.daemon = True
-    
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
     def run(self):
         try:
-            blob = get_thumbnail(self.file, self.size, self.quality)
-            ThumbnailStorage.instance.put(self.file, blob, self.size)
-            self.image = QImage.fromData(QByteArray(blob), "JPG")
+            self.image = ThumbnailStorage.instance.fetch(self.file, self.size, self.quality)
         except Exception as e:
             #print(e)
             self.image = QImage()
 
         self.signals.done.emit(self.image)
 
+class ThumbnailPrefetchRunnable(ThumbnailResponseRunnable):
+    def run(self):
+        storage = ThumbnailStorage.instance
+        try:
+            if not storage.has(self.file, self.size):
+                storage.fetch(self.file, self.size, self.quality)
+        except Exception:
+            pass
+
+class ThumbnailIdleRunnable(ThumbnailResponseRunnable):
+    def __init__(self, folder, size, quality):
+        super().__init__(folder, size, quality)
+        self.complete = False
+        self.done = False
+        self.fetched = 0
+
+    def run(self):
+        try:
+            self.fill()
+        finally:
+            self.done = True
+
+    def fill(self):
+        storage = ThumbnailStorage.instance
+        try:
+            entries = [e for e in os.scandir(self.file) if e.is_file() and e.name.lower().endswith(".png")]
+            entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        except OSError:
+            self.complete = True
+            return
+        for entry in entries:
+            if self.cancelled or storage.pool.busy(IDLE_PRIORITY):
+                return
+            if storage.full(self.size):
+                break
+            try:
+                if not storage.has(entry.path, self.size):
+                    storage.fetch(entry.path, self.size, self.quality)
+                    self.fetched += 1
+            except Exception:
+                pass
+        self.complete = True
+
+class ThumbnailPrefetcher(QObject):
+    def __init__(self, storage, size, quality, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.size = size
+        self.quality = quality
+        self.pending = []
+        self.folder = None
+        self.filled = None
+        self.idle = None
+        self.last = 0
+        self.requests = 0
+        self.prefetched = 0
+        self.fills = 0
+        self.fetched = 0
+
+        self.idleTimer = QTimer(self)
+        self.idleTimer.setInterval(int(PREFETCH_IDLE * 1000))
+        self.idleTimer.timeout.connect(self.onIdle)
+        self.idleTimer.start()
+
+    def prefetchRows(self, model, first, last, columns, velocity):
+        rows = min(PREFETCH_MAX_ROWS, PREFETCH_ROWS + int(abs(velocity) * PREFETCH_LOOKAHEAD))
+        count = rows * max(columns, 1)
+        length = model.length
+        if velocity >= 0:
+            indices = range(min(last + count, length - 1), last, -1)
+        else:
+            indices = range(max(first - count, 0), first)
+        # only rows on resident pages, a miss here must not page in the result
+        files = []
+        for i in indices:
+            record = model.resident(i)
+            if record and record.value("file"):
+                files += [QUrl.fromLocalFile(record.value("file")).toLocalFile()]
+        visible = []
+        for i in range(max(first, 0), min(last + 1, length)):
+            record = model.resident(i)
+            if record and record.value("file"):
+                visible += [QUrl.fromLocalFile(record.value("file")).toLocalFile()]
+        self.storage.pin(self.size, visible + files)
+        self.prefetch(files)
+
+    def prefetch(self, files):
+        self.cancel()
+        self.last = time.monotonic()
+        self.requests += 1
+        for file in files:
+            file = QUrl.fromLocalFile(file).toLocalFile()
+            if self.storage.has(file, self.size):
+                continue
+            runnable = ThumbnailPrefetchRunnable(file, self.size, self.quality)
+            self.pending += [runnable]
+            self.storage.pool.submit(runnable, PREFETCH_PRIORITY)
+        self.prefetched += len(self.pending)
+
+    def cancel(self):
+        for runnable in self.pending:
+            runnable.cancel()
+        self.pending = []
+        if self.idle and not self.idle.done:
+            self.idle.cancel()
+            self.idle = None
+
+    def setFolder(self, folder):
+        if folder == self.folder:
+            return
+        self.cancel()
+        self.folder = folder
+        self.filled = None
+        self.storage.pin(self.size, [])
+
+    @pyqtSlot()
+    def onIdle(self):
+        if self.idle and self.idle.done:
+            self.fetched += self.idle.fetched
+            if self.idle.complete and not self.idle.cancelled:
+                self.filled = self.idle.file
+            self.idle = None
+        if self.idle or not self.folder or self.filled == self.folder:
+            return
+        if time.monotonic() - self.last < PREFETCH_IDLE or self.storage.pool.busy(IDLE_PRIORITY):
+            return
+        self.idle = ThumbnailIdleRunnable(self.folder, self.size, self.quality)
+        self.storage.pool.submit(self.idle, IDLE_PRIORITY)
+        self.fills += 1
+
+    def stop(self):
+        self.idleTimer.stop()
+        self.cancel()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "prefetched": self.prefetched,
+            "fills": self.fills,
+            "filled": self.fetched,
+            "complete": self.filled == self.folder and self.folder != None
+        }
+
+class ThumbnailPool():
+    def __init__(self, count):
+        self.guard = threading.Condition()
+        self.queue = []
+        self.seq = 0
+        self.stopping = False
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.peak = 0
+        self.workers = [threading.Thread(target=self.work, daemon=True) for _ in range(count)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, runnable, priority=VISIBLE_PRIORITY):
+        with self.guard:
+            self.seq += 1
+            self.submitted += 1
+            heapq.heappush(self.queue, (priority, -self.seq, runnable))
+            self.peak = max(self.peak, len(self.queue))
+            self.guard.notify()
+
+    def work(self):
+        while True:
+            with self.guard:
+                while not self.queue and not self.stopping:
+                    self.guard.wait()
+                if self.stopping:
+                    return
+                _, _, runnable = heapq.heappop(self.queue)
+                cancelled = runnable.cancelled
+                if cancelled:
+                    self.cancelled += 1
+                else:
+                    self.active += 1
+            if cancelled:
+                runnable.signals.done.emit(QImage())
+                continue
+            runnable.run()
+            with self.guard:
+                self.active -= 1
+                self.completed += 1
+
+    def busy(self, priority):
+        with self.guard:
+            return bool(self.queue) and self.queue[0][0] < priority
+
+    def stop(self):
+        with self.guard:
+            self.stopping = True
+            self.queue = []
+            self.guard.notify_all()
+        for worker in self.workers:
+            worker.join()
+
+    def stats(self):
+        with self.guard:
+            return {
+                "workers": len(self.workers),
+                "active": self.active,
+                "queued": len(self.queue),
+                "peak": self.peak,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "cancelled": self.cancelled
+            }
+
 class ThumbnailResponse(QQuickImageResponse):
     def __init__(self, file, size, quality):
         super().__init__()
         file = QUrl.fromLocalFile(file).toLocalFile()
-        blob = ThumbnailStorage.instance.get(file, size)
-        if not blob:
+        self.runnable = None
+        image = ThumbnailStorage.instance.get(file, size)
+        if image is None:
             self.runnable = ThumbnailResponseRunnable(file, size, quality)
             self.runnable.signals.done.connect(self.onDone)
-            self.runnable.start()
+            self.destroyed.connect(self.runnable.cancel)
+            ThumbnailStorage.instance.pool.submit(self.runnable)
         else:
-            self.image = QImage.fromData(QByteArray(blob), "JPG")
+            self.image = image
             self.finished.emit()       
     
     @pyqtSlot('QImage')
     def onDone(self, image):
         self.image = QImage(image)
         self.finished.emit()
+
+    def cancel(self):
+        if self.runnable:
+            self.runnable.cancel()
     
     def textureFactory(self):
         self.texture = QQuickTextureFactory.textureFactoryForImage(self.image)
@@ -124,12 +778,9 @@ class SyncThumbnailProvider(QQuickImageProvider):
     def requestImage(self, path, size):
         file = QUrl.fromPercentEncoding(path.encode('utf-8'))
         try:
-            blob = ThumbnailStorage.instance.get(file, self.size)
-            if not blob:
-                blob = get_thumbnail(file, self.size, self.quality)
-                ThumbnailStorage.instance.put(file, blob, self.size)
-
-            image = QImage.fromData(QByteArray(blob), "JPG")
+            image = ThumbnailStorage.instance.get(file, self.size)
+            if image is None:
+                image = ThumbnailStorage.instance.fetch(file, self.size, self.quality)
             return image, image.size()
         except Exception as e:
             #print(e)